@@ -0,0 +1,148 @@
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+import board
+import puzzle_io
+from sudoku_engine import SudokuEngine
+
+# Outcomes besides a solution string.
+NO_SOLUTION = "no solution"
+MULTIPLE    = "multiple solutions"
+INVALID     = "invalid puzzle"
+
+CHUNK_SIZE = 200
+
+
+# count_solutions() runs the bitmask search whatever the engine's solver,
+# so the engines here are left on the default.
+_engine = None
+
+
+def _init_worker():
+    global _engine
+    _engine = SudokuEngine()
+
+
+def solve_puzzle(text, engine=None):
+    # One bitmask search finds the solution and, by looking for a second
+    # one, proves it unique.
+    engine = engine or _engine
+    try:
+        engine.load(text, text)
+    except ValueError:
+        return INVALID
+    solution = bytearray()
+    found    = engine.count_solutions(2, solution)
+    if not found:
+        return NO_SOLUTION
+    if found > 1:
+        return MULTIPLE
+    return board.to_string(solution)
+
+
+def _solve_chunk(chunk):
+    return [solve_puzzle(p) for p in chunk]
+
+
+def solve_batch(puzzles, processes=1, chunk_size=CHUNK_SIZE):
+    # Yields (puzzle, result) for each puzzle string, in input order, as
+    # results come in. With more than one process the puzzles are sent to
+    # a pool in chunks; only a few chunks per process are in flight, so
+    # the input is read no faster than it is solved.
+    puzzles = iter(puzzles)
+    if processes <= 1:
+        engine = SudokuEngine()
+        for p in puzzles:
+            yield p, solve_puzzle(p, engine)
+        return
+    chunks = iter(lambda: list(islice(puzzles, chunk_size)), [])
+    with Pool(processes, initializer=_init_worker) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.apply_async(_solve_chunk, (chunk,))))
+            if len(pending) > 2 * processes:
+                chunk, job = pending.popleft()
+                yield from zip(chunk, job.get())
+        while pending:
+            chunk, job = pending.popleft()
+            yield from zip(chunk, job.get())
+
+
+def solve_loop(puzzles, solver="mrv"):
+    # The one-at-a-time baseline: SudokuEngine.solve() on each puzzle.
+    engine = SudokuEngine(solver)
+    for p in puzzles:
+        try:
+            engine.load(p, p)
+        except ValueError:
+            continue
+        engine.solve()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Solve a file of puzzles and check each is unique.")
+    ap.add_argument("input", help="puzzle collection, text or binary ('-' for text on stdin)")
+    ap.add_argument("-o", "--output",
+                    help="write 'puzzle,result' lines here ('-' for stdout)")
+    ap.add_argument("-j", "--processes", type=int, default=os.cpu_count())
+    ap.add_argument("-b", "--chunk-size", type=int, default=CHUNK_SIZE,
+                    help="puzzles per worker task")
+    ap.add_argument("--compare", type=int, default=0, metavar="N",
+                    help="also time SudokuEngine.solve() on the first N "
+                         "puzzles and report both throughputs")
+    args = ap.parse_args(argv)
+
+    out = None
+    if args.output:
+        out = sys.stdout if args.output == "-" else open(args.output, "w")
+    outcomes = {"solved": 0, NO_SOLUTION: 0, MULTIPLE: 0, INVALID: 0}
+    # The --compare sample is kept as the main pass reads it, since stdin
+    # cannot be read twice.
+    sample = []
+
+    def puzzles():
+        for p in puzzle_io.puzzles(args.input):
+            if len(sample) < args.compare:
+                sample.append(p)
+            yield p
+
+    start = time.perf_counter()
+    try:
+        for puzzle, result in solve_batch(puzzles(), args.processes,
+                                          args.chunk_size):
+            outcomes[result if result in outcomes else "solved"] += 1
+            if out:
+                out.write(f"{puzzle},{result}\n")
+    finally:
+        if out and out is not sys.stdout:
+            out.close()
+    secs = time.perf_counter() - start
+    done = sum(outcomes.values())
+    rate = done / secs if secs else 0.0
+    print(f"{done} puzzles in {secs:.2f}s — {rate:.1f}/s "
+          f"({args.processes} processes)", file=sys.stderr)
+    print(", ".join(f"{n} {k}" for k, n in outcomes.items()), file=sys.stderr)
+
+    if args.compare and not sample:
+        print("no puzzles to compare on", file=sys.stderr)
+    elif args.compare:
+        start = time.perf_counter()
+        solve_loop(sample)
+        loop = len(sample) / (time.perf_counter() - start or 1e-9)
+        start = time.perf_counter()
+        for _ in solve_batch(sample, args.processes, args.chunk_size):
+            pass
+        batch = len(sample) / (time.perf_counter() - start or 1e-9)
+        print(f"on {len(sample)} puzzles: solve() loop {loop:.1f}/s, "
+              f"batch {batch:.1f}/s ({batch / loop:.2f}x)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
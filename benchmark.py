@@ -0,0 +1,225 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import grader
+import puzzle_io
+from database import hash_password, verify_password
+from sudoku_engine import SOLVERS, SudokuEngine
+
+DIFFICULTIES = ("Easy", "Medium", "Hard", "Expert")
+
+# Well-known hard puzzles, each with a unique solution.
+CORPUS = {
+    "arto_inkala":
+        "800000000003600000070090200050007000000045700000100030001000068008500010090000400",
+    "golden_nugget":
+        "000000039000001005003050800008090006070002000100400000009080050020000600400700000",
+    "easter_monster":
+        "100000002090400050006000700050903000000070000000850040700000600030009080002000001",
+    "platinum_blonde":
+        "000000012000000003002300400001800005060070800000009000008500000900040500470006000",
+    "17_clue":
+        "000000010400000000020000000000050407008000300001090000300400200050100000000806000",
+}
+# A solve gives up after this many nodes and its case is marked capped:
+# the row-major backtracker needs minutes on platinum_blonde and 17_clue.
+NODE_CAP = 100_000
+
+WARMUP       = 2        # untimed runs before each case
+MIN_DELTA_MS = 0.05     # p50 changes smaller than this are timer noise
+
+DEFAULT_OUTPUT   = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(setup, fn, repeat):
+    # fn returns a node count or None; nodes is the total over the timed
+    # runs, which for a given seed and repeat never changes.
+    for k in range(min(WARMUP, repeat)):
+        fn(setup(k))
+    times, nodes = [], None
+    for k in range(repeat):
+        arg = setup(k)
+        t = time.perf_counter()
+        n = fn(arg)
+        times.append((time.perf_counter() - t) * 1000)
+        if n is not None:
+            nodes = (nodes or 0) + n
+    # Peak memory comes from one extra traced run so tracing does not
+    # skew the timings above.
+    arg = setup(0)
+    tracemalloc.start()
+    fn(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    result = {
+        "mean_ms": sum(times) / len(times),
+        "p50_ms":  percentile(times, 0.50),
+        "p99_ms":  percentile(times, 0.99),
+        "peak_kb": peak / 1024,
+    }
+    if nodes is not None:
+        result["nodes"] = nodes
+        result["runs"]  = repeat
+    return result
+
+
+def measure_solve(engine, load, repeat):
+    # Times engine.solve() on the puzzle load(k) puts in it, k = 0..repeat-1.
+    capped = []
+
+    def setup(k):
+        load(k)
+        return engine
+
+    def solve(e):
+        if not e.solve(NODE_CAP):
+            if e.nodes < NODE_CAP:
+                raise RuntimeError(f"{e.solver} found no solution")
+            capped.append(True)
+        return e.nodes
+
+    result = measure(setup, solve, repeat)
+    if capped:
+        result["capped"] = True
+    return result
+
+
+def run(repeat, seed, corpus=None, corpus_size=100):
+    results = {}
+    engine  = SudokuEngine()
+
+    for d in DIFFICULTIES:
+        results[f"generate/{d}"] = measure(
+            lambda k: seed + k,
+            lambda s, d=d: engine.generate(d, s),
+            repeat)
+
+    # The same seeded puzzles are graded here and solved below.
+    generated = {}
+    for d in DIFFICULTIES:
+        puzzles = []
+        packed  = generated[d] = []
+        for k in range(repeat):
+            engine.generate(d, seed + k)
+            puzzles.append(engine.grid[:])
+            packed.append(engine.pack())
+        results[f"grade/{d}"] = measure(
+            lambda k: puzzles[k], lambda p: grader.rate(p) and None, repeat)
+
+    for solver in SOLVERS:
+        solving = SudokuEngine(solver)
+        for name, puzzle in CORPUS.items():
+            results[f"solve/{solver}/{name}"] = measure_solve(
+                solving, lambda k, p=puzzle: solving.load(p, p), repeat)
+
+        for d, packed in generated.items():
+            results[f"solve/{solver}/{d}"] = measure_solve(
+                solving, lambda k, p=packed: solving.load_packed(p[k]),
+                repeat)
+
+    # Only the first corpus_size puzzles are read from the file.
+    puzzles = ([data for _, data in puzzle_io.read(corpus, 0, corpus_size)]
+               if corpus else [])
+    if puzzles:
+        for solver in SOLVERS:
+            solving = SudokuEngine(solver)
+            results[f"solve/{solver}/corpus"] = measure_solve(
+                solving, lambda k: solving.load_packed(puzzles[k]),
+                len(puzzles))
+
+    engine.generate("Expert", seed)
+    engine.solve()
+    for check in ("is_valid", "is_complete"):
+        results[check] = measure(
+            lambda k: getattr(engine, check),
+            lambda fn: fn() and None,
+            repeat * 20)
+
+    # One PBKDF2 run costs about a quarter of a second, so a few repeats
+    # are enough to see the login latency.
+    stored = hash_password("correct horse")
+    results["auth/hash_password"] = measure(
+        lambda k: "correct horse",
+        lambda pw: hash_password(pw) and None,
+        min(repeat, 5))
+    results["auth/verify_password"] = measure(
+        lambda k: stored,
+        lambda h: verify_password("correct horse", h) and None,
+        min(repeat, 5))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, base in baseline.items():
+        now = results.get(name)
+        if now is None:
+            continue
+        if (now["p50_ms"] - base["p50_ms"] > MIN_DELTA_MS
+                and now["p50_ms"] > base["p50_ms"] * (1 + tolerance)):
+            regressions.append(
+                f"{name}: p50 {base['p50_ms']:.3f} -> {now['p50_ms']:.3f} ms")
+        # Node counts only compare between runs of the same length.
+        if ("nodes" in base and now.get("runs") == base.get("runs")
+                and now.get("nodes", 0) > base["nodes"]):
+            regressions.append(
+                f"{name}: nodes {base['nodes']} -> {now['nodes']}")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Benchmark puzzle generation, solving and validation.")
+    ap.add_argument("-r", "--repeat", type=int, default=20)
+    ap.add_argument("-s", "--seed", type=int, default=0)
+    ap.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    ap.add_argument("-b", "--baseline", default=DEFAULT_BASELINE)
+    ap.add_argument("-t", "--tolerance", type=float, default=0.25,
+                    help="allowed p50 slowdown before failing (0.25 = 25%%)")
+    ap.add_argument("-c", "--corpus",
+                    help="also time solving puzzles from this collection "
+                         "(text or binary, see puzzle_io.py)")
+    ap.add_argument("-n", "--corpus-size", type=int, default=100,
+                    help="how many corpus puzzles to solve")
+    ap.add_argument("--save-baseline", action="store_true",
+                    help="store these results as the new baseline")
+    args = ap.parse_args(argv)
+
+    results = run(args.repeat, args.seed, args.corpus, args.corpus_size)
+    for name, r in results.items():
+        nodes = f"  {r['nodes']:>7} nodes" if "nodes" in r else ""
+        if r.get("capped"):
+            nodes += " (capped)"
+        print(f"{name:<34} mean {r['mean_ms']:9.3f}  p50 {r['p50_ms']:9.3f}"
+              f"  p99 {r['p99_ms']:9.3f} ms  peak {r['peak_kb']:8.1f} KB"
+              f"{nodes}")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline.")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# A board is a bytearray of 81 cell values (0 = empty) in row-major order.
+# Clues are an 81-bit int with bit i set when cell i is a given. A puzzle
+# and its solution pack into PACKED_SIZE bytes: an 11-byte clue bitmap
+# followed by the 81 solution digits as 41 bytes of nibbles.
+
+CLUE_BYTES  = 11
+PACKED_SIZE = CLUE_BYTES + 41
+
+# Geometry tables, built once at import. RCB[i] is the (row, column, box)
+# of cell i; UNITS lists the 27 units' cells (rows, then columns, then
+# boxes), so cell i sits in UNITS[r], UNITS[9 + c] and UNITS[18 + b].
+# PEERS[i] holds the 20 other cells sharing a unit with i.
+RCB   = tuple((i // 9, i % 9, i // 27 * 3 + i % 9 // 3) for i in range(81))
+ROWS  = tuple(tuple(r*9 + c for c in range(9)) for r in range(9))
+COLS  = tuple(tuple(r*9 + c for r in range(9)) for c in range(9))
+BOXES = tuple(tuple(i for i in range(81) if RCB[i][2] == b) for b in range(9))
+UNITS = ROWS + COLS + BOXES
+PEERS = tuple(tuple(sorted(set(ROWS[r] + COLS[c] + BOXES[b]) - {i}))
+              for i, (r, c, b) in enumerate(RCB))
+
+# RECTANGLES holds the corners (a, b, c, d) of every rectangle of two rows
+# and two columns that covers exactly two boxes: a and b share a row, a
+# and c a column.
+RECTANGLES = tuple((r1*9 + c1, r1*9 + c2, r2*9 + c1, r2*9 + c2)
+                   for r1 in range(9) for r2 in range(r1 + 1, 9)
+                   for c1 in range(9) for c2 in range(c1 + 1, 9)
+                   if (r1 // 3 == r2 // 3) != (c1 // 3 == c2 // 3))
+
+# Candidate sets are bitmasks with bit d set when digit d is possible;
+# POP[m] is the number of digits in mask m.
+ALL = 0x3FE          # bits 1..9 set — one bit per digit
+POP = tuple(bin(m).count("1") for m in range(1 << 10))
+
+_FROM_TEXT = bytes.maketrans(b"0123456789.", bytes(range(10)) + b"\0")
+_TO_TEXT   = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+
+def empty():
+    return bytearray(81)
+
+
+def parse(text):
+    cells = bytearray(text.strip().encode("ascii").translate(_FROM_TEXT))
+    if len(cells) != 81 or max(cells) > 9:
+        raise ValueError(f"Not an 81-cell puzzle: {text!r}")
+    return cells
+
+
+def to_string(cells):
+    return bytes(cells).translate(_TO_TEXT).decode("ascii")
+
+
+def clue_mask(cells):
+    mask = 0
+    for i, n in enumerate(cells):
+        if n:
+            mask |= 1 << i
+    return mask
+
+
+def deadly_rectangles(solution):
+    # Maps each cell to the other three corners of every rectangle whose
+    # corners hold two digits crosswise. With all four blank the digits
+    # can swap, so a puzzle that blanks them is never unique.
+    deadly = {}
+    for a, b, c, d in RECTANGLES:
+        if solution[a] == solution[d] and solution[b] == solution[c]:
+            for i, rest in ((a, (b, c, d)), (b, (a, c, d)),
+                            (c, (a, b, d)), (d, (a, b, c))):
+                deadly.setdefault(i, []).append(rest)
+    return deadly
+
+
+def masked(solution, clues):
+    cells = bytearray(solution)
+    for i in range(81):
+        if not clues >> i & 1:
+            cells[i] = 0
+    return cells
+
+
+def pack(solution, clues):
+    return (clues.to_bytes(CLUE_BYTES, "big")
+            + bytes.fromhex(to_string(solution) + "0"))
+
+
+def unpack(data):
+    clues    = int.from_bytes(data[:CLUE_BYTES], "big")
+    solution = parse(bytes(data[CLUE_BYTES:PACKED_SIZE]).hex()[:81])
+    return solution, clues
@@ -1,13 +1,135 @@
 import sqlite3
 import hashlib
+import hmac
+import os
+import sys
+import threading
 from datetime import datetime
 
 DB_FILE = "sudoku.db"
 
+# The leaderboard table keeps only the best LEADERBOARD_SIZE scores of
+# each scope ("All" plus one scope per difficulty), so reading it never
+# depends on how many scores are stored.
+LEADERBOARD_SIZE = 100
+LEADERBOARD_ALL  = "All"
+
+# Passwords are stored as "pbkdf2_sha256$<iterations>$<salt>$<hash>", so
+# raising PBKDF2_ITERATIONS later only affects new and upgraded hashes.
+# Bare 64-digit hex strings are unsalted SHA-256 hashes from older
+# versions and are replaced on the user's next successful login.
+PBKDF2_ITERATIONS = 600_000
+SALT_BYTES        = 16
+
+# Each thread keeps one long-lived connection to DB_FILE. sqlite3 caches
+# prepared statements per connection keyed on the SQL text, so the
+# statements below are compiled once per thread and then reused.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA busy_timeout=5000",
+)
+
+SQL_INSERT_USER = """
+    INSERT INTO users (username, password, created) VALUES (?, ?, ?)
+"""
+SQL_FIND_USER = "SELECT id, password FROM users WHERE username=?"
+SQL_SET_PASSWORD = "UPDATE users SET password=? WHERE id=?"
+SQL_INSERT_SCORE = """
+    INSERT INTO scores
+    (user_id, difficulty, time_secs, hints_used, score, played_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+SQL_INSERT_LEADER = """
+    INSERT INTO leaderboard
+    (scope, score_id, score, username, difficulty, time_secs, played_at)
+    SELECT ?, s.id, s.score, u.username, s.difficulty, s.time_secs,
+           s.played_at
+    FROM scores s JOIN users u ON s.user_id = u.id
+    WHERE s.id = ?
+"""
+SQL_TRIM_LEADER = """
+    DELETE FROM leaderboard WHERE scope=? AND score_id IN (
+        SELECT score_id FROM leaderboard WHERE scope=?
+        ORDER BY score DESC, score_id LIMIT -1 OFFSET ?
+    )
+"""
+# Leaderboard pages are ordered by score DESC, id and continue after a
+# (score, id) cursor. "score <= ?" lets the scan seek straight to the
+# cursor instead of skipping the rows of earlier pages.
+SQL_LEADER_PAGE = """
+    SELECT score_id, username, difficulty, time_secs, score, played_at
+    FROM leaderboard WHERE {}
+    ORDER BY score DESC, score_id LIMIT ?
+"""
+SQL_SCORE_PAGE = """
+    SELECT s.id, u.username, s.difficulty, s.time_secs, s.score, s.played_at
+    FROM scores s JOIN users u ON s.user_id = u.id
+    WHERE {}
+    ORDER BY s.score DESC, s.id LIMIT ?
+"""
+SQL_LEADERBOARD = """
+    SELECT username, difficulty, time_secs, score, played_at
+    FROM leaderboard WHERE scope=?
+    ORDER BY score DESC, score_id LIMIT ?
+"""
+# Everything the profile screen needs in one pass over the user's rows of
+# idx_scores_user, which covers every column read here.
+SQL_PROFILE = """
+    SELECT u.created, s.difficulty, COUNT(s.score), MAX(s.score),
+           SUM(s.score), MIN(s.time_secs)
+    FROM users u
+    LEFT JOIN scores s ON s.user_id = u.id
+    WHERE u.id = ?
+    GROUP BY s.difficulty
+"""
+SQL_INSERT_POOLED = """
+    INSERT INTO puzzle_pool (difficulty, data, created) VALUES (?, ?, ?)
+"""
+SQL_NEXT_POOLED = """
+    SELECT id, data FROM puzzle_pool
+    WHERE difficulty=? ORDER BY id LIMIT 1
+"""
+SQL_DELETE_POOLED = "DELETE FROM puzzle_pool WHERE id=?"
+
+_local       = threading.local()
+_init_lock   = threading.Lock()
+_initialized = set()
+
+
+def get_conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.path != DB_FILE:
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(DB_FILE, timeout=5, cached_statements=64)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn, _local.path = conn, DB_FILE
+    return conn
+
+
+def close_db():
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
 
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    with _init_lock:
+        if DB_FILE in _initialized:
+            return
+        conn = get_conn()
+        with conn:
+            _create_schema(conn.cursor())
+        _initialized.add(DB_FILE)
+
+
+def _create_schema(c):
     c.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id       INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,93 +150,251 @@ def init_db():
             FOREIGN KEY(user_id) REFERENCES users(id)
         )
     """)
-    conn.commit()
-    conn.close()
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scores_user
+        ON scores(user_id, difficulty, score, time_secs)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scores_score
+        ON scores(score DESC)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scores_diff_score
+        ON scores(difficulty, score DESC)
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scores_user_score
+        ON scores(user_id, score DESC)
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            scope      TEXT NOT NULL,
+            score_id   INTEGER NOT NULL,
+            score      INTEGER NOT NULL,
+            username   TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            time_secs  INTEGER NOT NULL,
+            played_at  TEXT NOT NULL,
+            PRIMARY KEY(scope, score_id),
+            FOREIGN KEY(score_id) REFERENCES scores(id)
+        )
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+        ON leaderboard(scope, score DESC, score_id)
+    """)
+    # Databases from before the leaderboard table existed get it filled
+    # from their scores once.
+    c.execute("""
+        SELECT EXISTS(SELECT 1 FROM scores)
+           AND NOT EXISTS(SELECT 1 FROM leaderboard)
+    """)
+    if c.fetchone()[0]:
+        _fill_leaderboard(c)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS puzzle_pool (
+            id         INTEGER PRIMARY KEY AUTOINCREMENT,
+            difficulty TEXT NOT NULL,
+            data       BLOB NOT NULL,
+            created    TEXT NOT NULL
+        )
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_pool_difficulty
+        ON puzzle_pool(difficulty, id)
+    """)
 
 
-def hash_password(pw):
-    return hashlib.sha256(pw.encode()).hexdigest()
+def hash_password(pw, salt=None, iterations=PBKDF2_ITERATIONS):
+    salt = salt or os.urandom(SALT_BYTES)
+    key  = hashlib.pbkdf2_hmac("sha256", pw.encode(), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${key.hex()}"
+
+
+def verify_password(pw, stored):
+    # Returns (matches, needs_rehash).
+    if "$" not in stored:
+        legacy = hashlib.sha256(pw.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored), True
+    _, iterations, salt, _ = stored.split("$")
+    iterations = int(iterations)
+    ok = hmac.compare_digest(
+        hash_password(pw, bytes.fromhex(salt), iterations), stored)
+    return ok, ok and iterations < PBKDF2_ITERATIONS
 
 
 def register_user(username, password):
     try:
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO users (username, password, created) VALUES (?, ?, ?)",
-            (username, hash_password(password),
-             datetime.now().strftime("%Y-%m-%d"))
-        )
-        conn.commit()
-        conn.close()
+        conn = get_conn()
+        with conn:
+            conn.execute(
+                SQL_INSERT_USER,
+                (username, hash_password(password),
+                 datetime.now().strftime("%Y-%m-%d"))
+            )
         return True, "Account created!"
     except sqlite3.IntegrityError:
         return False, "Username already taken."
 
 
 def login_user(username, password):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, password FROM users WHERE username=?", (username,))
-    row = c.fetchone()
-    conn.close()
-    if row and row[1] == hash_password(password):
-        return True, row[0]
-    return False, None
+    conn = get_conn()
+    row  = conn.execute(SQL_FIND_USER, (username,)).fetchone()
+    if row is None:
+        # Hash anyway so unknown usernames take as long as wrong passwords.
+        hash_password(password)
+        return False, None
+    ok, rehash = verify_password(password, row[1])
+    if not ok:
+        return False, None
+    if rehash:
+        with conn:
+            conn.execute(SQL_SET_PASSWORD, (hash_password(password), row[0]))
+    return True, row[0]
+
+
+def score_record(user_id, difficulty, time_secs, hints_used, score):
+    return (user_id, difficulty, time_secs, hints_used, score,
+            datetime.now().strftime("%Y-%m-%d %H:%M"))
 
 
 def save_score(user_id, difficulty, time_secs, hints_used, score):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(
-        """INSERT INTO scores
-           (user_id, difficulty, time_secs, hints_used, score, played_at)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (user_id, difficulty, time_secs, hints_used, score,
-         datetime.now().strftime("%Y-%m-%d %H:%M"))
-    )
-    conn.commit()
-    conn.close()
+    save_scores([score_record(user_id, difficulty, time_secs,
+                              hints_used, score)])
 
 
-def get_leaderboard():
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("""
-        SELECT u.username, s.difficulty, s.time_secs, s.score, s.played_at
-        FROM scores s
-        JOIN users u ON s.user_id = u.id
-        ORDER BY s.score DESC
-        LIMIT 20
-    """)
-    rows = c.fetchall()
-    conn.close()
-    return rows
+def save_scores(records):
+    # Writes a batch of score_record tuples in one transaction.
+    conn = get_conn()
+    with conn:
+        for record in records:
+            c = conn.execute(SQL_INSERT_SCORE, record)
+            for scope in (LEADERBOARD_ALL, record[1]):
+                conn.execute(SQL_INSERT_LEADER, (scope, c.lastrowid))
+                conn.execute(SQL_TRIM_LEADER,
+                             (scope, scope, LEADERBOARD_SIZE))
+
+
+def get_leaderboard(difficulty=None, limit=20):
+    c = get_conn().cursor()
+    c.execute(SQL_LEADERBOARD, (difficulty or LEADERBOARD_ALL, limit))
+    return c.fetchall()
+
+
+def _score_filters(difficulty, since, until, user_id):
+    # since/until compare against played_at ("YYYY-MM-DD HH:MM"), so
+    # plain dates work; until is exclusive.
+    where, args = ["1"], []
+    for clause, value in (("s.difficulty = ?", difficulty),
+                          ("s.played_at >= ?", since),
+                          ("s.played_at < ?",  until),
+                          ("s.user_id = ?",    user_id)):
+        if value is not None:
+            where.append(clause)
+            args.append(value)
+    return where, args
+
+
+def _after(where, args, cursor, score, key):
+    if cursor is not None:
+        where.append(f"{score} <= ? AND ({score} < ? OR {key} > ?)")
+        args.extend((cursor[0], cursor[0], cursor[1]))
+
+
+def leaderboard_page(cursor=None, limit=20, difficulty=None,
+                     since=None, until=None, user_id=None):
+    # Returns (rows, next_cursor); next_cursor is None on the last page.
+    conn = get_conn()
+    rows = []
+    if since is None and until is None and user_id is None:
+        # Unfiltered pages come from the materialized top-N first and
+        # only fall back to scores once they run past it.
+        scope = difficulty or LEADERBOARD_ALL
+        where, args = ["scope = ?"], [scope]
+        _after(where, args, cursor, "score", "score_id")
+        rows = conn.execute(SQL_LEADER_PAGE.format(" AND ".join(where)),
+                            args + [limit]).fetchall()
+        if len(rows) == limit:
+            return _page(rows, limit)
+        stored = conn.execute("SELECT COUNT(*) FROM leaderboard WHERE scope=?",
+                              (scope,)).fetchone()[0]
+        if stored < LEADERBOARD_SIZE:
+            return _page(rows, limit)
+        if rows:
+            cursor = rows[-1][4], rows[-1][0]
+    where, args = _score_filters(difficulty, since, until, user_id)
+    _after(where, args, cursor, "s.score", "s.id")
+    rows += conn.execute(SQL_SCORE_PAGE.format(" AND ".join(where)),
+                         args + [limit - len(rows)]).fetchall()
+    return _page(rows, limit)
+
+
+def _page(rows, limit):
+    cursor = (rows[-1][4], rows[-1][0]) if len(rows) == limit else None
+    return [row[1:] for row in rows], cursor
+
+
+def user_rank(user_id, difficulty=None, since=None, until=None):
+    # Rank of the user's best score among all scores matching the
+    # filters, or None. Counting only walks the index up to that score.
+    conn = get_conn()
+    where, args = _score_filters(difficulty, since, until, user_id)
+    best = conn.execute(SQL_SCORE_PAGE.format(" AND ".join(where)),
+                        args + [1]).fetchone()
+    if best is None:
+        return None
+    score_id, score = best[0], best[4]
+    where, args = _score_filters(difficulty, since, until, None)
+    where.append("s.score >= ? AND (s.score > ? OR s.id < ?)")
+    args.extend((score, score, score_id))
+    ahead = conn.execute(
+        f"SELECT COUNT(*) FROM scores s WHERE {' AND '.join(where)}",
+        args).fetchone()[0]
+    return ahead + 1, score
+
+
+def _fill_leaderboard(c):
+    c.execute("DELETE FROM leaderboard")
+    c.execute("SELECT DISTINCT difficulty FROM scores")
+    scopes = [LEADERBOARD_ALL] + [row[0] for row in c.fetchall()]
+    for scope in scopes:
+        c.execute("""
+            INSERT INTO leaderboard
+            (scope, score_id, score, username, difficulty, time_secs,
+             played_at)
+            SELECT ?, s.id, s.score, u.username, s.difficulty, s.time_secs,
+                   s.played_at
+            FROM scores s JOIN users u ON s.user_id = u.id
+            WHERE ? IN (s.difficulty, ?)
+            ORDER BY s.score DESC, s.id LIMIT ?
+        """, (scope, scope, LEADERBOARD_ALL, LEADERBOARD_SIZE))
+
+
+def rebuild_leaderboard():
+    init_db()
+    conn = get_conn()
+    with conn:
+        _fill_leaderboard(conn.cursor())
+    return get_conn().execute(
+        "SELECT COUNT(*) FROM leaderboard").fetchone()[0]
 
 
 def get_profile(user_id, username):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT created FROM users WHERE id=?", (user_id,))
-    joined = c.fetchone()[0]
-    c.execute("SELECT COUNT(*) FROM scores WHERE user_id=?", (user_id,))
-    total = c.fetchone()[0]
-    c.execute("SELECT MAX(score) FROM scores WHERE user_id=?", (user_id,))
-    best = c.fetchone()[0] or 0
-    c.execute("SELECT SUM(score) FROM scores WHERE user_id=?", (user_id,))
-    total_score = c.fetchone()[0] or 0
-    by_diff = {}
-    for diff in ("Easy", "Medium", "Hard", "Expert"):
-        c.execute(
-            """SELECT MIN(time_secs), MAX(score) FROM scores
-               WHERE user_id=? AND difficulty=?""",
-            (user_id, diff)
-        )
-        by_diff[diff] = c.fetchone()
-    conn.close()
+    c = get_conn().cursor()
+    c.execute(SQL_PROFILE, (user_id,))
+    rows = c.fetchall()
+    by_diff = {d: (None, None) for d in ("Easy", "Medium", "Hard", "Expert")}
+    total = best = total_score = 0
+    for joined, diff, games, top, points, fastest in rows:
+        if diff is None:
+            continue
+        by_diff[diff] = (fastest, top)
+        total       += games
+        total_score += points
+        best         = max(best, top)
     return {
         "username":     username,
-        "joined":       joined,
+        "joined":       rows[0][0],
         "total":        total,
         "best_single":  best,
         "total_score":  total_score,
@@ -122,8 +402,44 @@ def get_profile(user_id, username):
     }
 
 
+def add_pooled_puzzles(difficulty, puzzles):
+    created = datetime.now().strftime("%Y-%m-%d %H:%M")
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            SQL_INSERT_POOLED,
+            [(difficulty, data, created) for data in puzzles]
+        )
+
+
+def pop_pooled_puzzle(difficulty):
+    conn = get_conn()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(SQL_NEXT_POOLED, (difficulty,)).fetchone()
+        if row:
+            conn.execute(SQL_DELETE_POOLED, (row[0],))
+    return row[1] if row else None
+
+
+def pooled_puzzle_counts():
+    c = get_conn().cursor()
+    c.execute("""
+        SELECT difficulty, COUNT(*) FROM puzzle_pool
+        GROUP BY difficulty
+    """)
+    return dict(c.fetchall())
+
+
 def calculate_score(difficulty, time_secs, hints_used):
     base = {"Easy": 100, "Medium": 200, "Hard": 350, "Expert": 500}
     time_bonus   = max(0, 300 - time_secs)
     hint_penalty = hints_used * 20
     return max(0, base.get(difficulty, 100) + time_bonus - hint_penalty)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--rebuild-leaderboard"]:
+        print(f"Leaderboard rebuilt with {rebuild_leaderboard()} entries.")
+    else:
+        sys.exit("usage: python database.py --rebuild-leaderboard")
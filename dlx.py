@@ -0,0 +1,158 @@
+from itertools import islice
+
+# Exact-cover matrix for Sudoku: 324 constraint columns (cell filled,
+# row has digit, column has digit, box has digit) and 729 candidate rows
+# (one per cell/digit), four nodes per row. Node 0 is the root header and
+# nodes 1..324 are the column headers.
+NCOLS = 324
+
+
+def _build():
+    n = NCOLS + 1
+    L = [i - 1 for i in range(n)]
+    R = [i + 1 for i in range(n)]
+    L[0], R[-1] = NCOLS, 0
+    U = list(range(n))
+    D = list(range(n))
+    C = list(range(n))
+    ROW = [-1] * n
+    for r in range(9):
+        for c in range(9):
+            b = (r // 3) * 3 + c // 3
+            for d in range(9):
+                cols = (1 + r*9 + c, 82 + r*9 + d,
+                        163 + c*9 + d, 244 + b*9 + d)
+                first = len(C)
+                for k, col in enumerate(cols):
+                    node = first + k
+                    L.append(first + (k - 1) % 4)
+                    R.append(first + (k + 1) % 4)
+                    U.append(U[col])
+                    D.append(col)
+                    D[U[col]] = node
+                    U[col] = node
+                    C.append(col)
+                    ROW.append((r*9 + c)*9 + d)
+    return L, R, U, D, C, ROW
+
+
+_L, _R, _U, _D, _C, _ROW = _build()
+# Index of the first node of candidate row (cell, digit).
+_FIRST = {row: i for i, row in enumerate(_ROW) if row >= 0 and _C[i] <= 81}
+
+
+class _Matrix:
+    def __init__(self, tick=None):
+        self.L, self.R = _L[:], _R[:]
+        self.U, self.D = _U[:], _D[:]
+        self.S = [9] * (NCOLS + 1)
+        self.nodes   = 0
+        self.tick    = tick
+        self.stopped = False
+
+    def cover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, _C, self.S
+        R[L[c]], L[R[c]] = R[c], L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                D[U[j]], U[D[j]] = D[j], U[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, _C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                D[U[j]] = U[D[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = L[R[c]] = c
+
+    def search(self, chosen):
+        # tick(nodes), if given, is called at every node; a true result
+        # abandons the search, leaving the matrix unusable.
+        self.nodes += 1
+        if self.tick and self.tick(self.nodes):
+            self.stopped = True
+            return
+        R, D, S = self.R, self.D, self.S
+        c = R[0]
+        if c == 0:
+            yield chosen
+            return
+        # Knuth's S heuristic: branch on the column with the fewest rows.
+        best, j = c, R[c]
+        while j != 0 and S[best] > 1:
+            if S[j] < S[best]:
+                best = j
+            j = R[j]
+        if S[best] == 0:
+            return
+        self.cover(best)
+        r = D[best]
+        while r != best:
+            j = self.R[r]
+            while j != r:
+                self.cover(_C[j])
+                j = self.R[j]
+            chosen.append(_ROW[r])
+            yield from self.search(chosen)
+            if self.stopped:
+                return
+            chosen.pop()
+            j = self.L[r]
+            while j != r:
+                self.uncover(_C[j])
+                j = self.L[j]
+            r = D[r]
+        self.uncover(best)
+
+
+def _given(grid, tick=None):
+    # Covers the columns of every clue; returns None on conflicting clues.
+    m, covered, rows = _Matrix(tick), set(), []
+    for cell, n in enumerate(grid):
+        if not n:
+            continue
+        node = _FIRST[cell*9 + n - 1]
+        cols = [_C[node + k] for k in range(4)]
+        if covered.intersection(cols):
+            return None
+        covered.update(cols)
+        for col in cols:
+            m.cover(col)
+        rows.append(_ROW[node])
+    return m, rows
+
+
+def solutions(grid, stats=None, tick=None):
+    start = _given(grid, tick)
+    if start is None:
+        return
+    m, rows = start
+    try:
+        for chosen in m.search(rows):
+            out = bytearray(81)
+            for row in chosen:
+                cell, d = divmod(row, 9)
+                out[cell] = d + 1
+            if stats is not None:
+                stats["nodes"] = m.nodes
+            yield out
+    finally:
+        if stats is not None:
+            stats["nodes"] = m.nodes
+
+
+def solve(grid, stats=None, tick=None):
+    return next(solutions(grid, stats, tick), None)
+
+
+def count(grid, limit=2):
+    return sum(1 for _ in islice(solutions(grid), limit))
@@ -0,0 +1,42 @@
+import time
+
+
+class GameClock:
+    # Play time is the sum of monotonic-clock spans while running, so a
+    # stalled event loop can delay the display but never the score.
+    def __init__(self):
+        self._since  = None      # time.monotonic() when the current run began
+        self._banked = 0.0       # seconds from earlier runs
+        self._paused = False
+
+    def start(self):
+        self._since  = time.monotonic()
+        self._banked = 0.0
+        self._paused = False
+
+    def stop(self):
+        self._bank()
+        self._paused = False
+
+    def pause(self):
+        if self._since is not None:
+            self._bank()
+            self._paused = True
+
+    def resume(self):
+        if self._paused:
+            self._since  = time.monotonic()
+            self._paused = False
+
+    def is_running(self):
+        return self._since is not None
+
+    def elapsed(self):
+        if self._since is None:
+            return self._banked
+        return self._banked + time.monotonic() - self._since
+
+    def _bank(self):
+        if self._since is not None:
+            self._banked += time.monotonic() - self._since
+            self._since   = None
@@ -0,0 +1,211 @@
+from itertools import combinations
+
+from board import ALL, BOXES, COLS, PEERS, POP, RCB, ROWS, UNITS
+
+# Rates a puzzle by solving it the way a person would: at every step the
+# easiest technique that makes progress is applied, and the rating is the
+# weight of the hardest one the puzzle needed (the Sudoku Explainer
+# scale). Puzzles these techniques cannot finish need guessing and get
+# GUESS. Candidates are bitmasks with bit d set when digit d is possible.
+
+HIDDEN_SINGLE_BOX  = 1.2
+HIDDEN_SINGLE_LINE = 1.5
+NAKED_SINGLE       = 2.3
+POINTING           = 2.6
+CLAIMING           = 2.8
+NAKED_PAIR         = 3.0
+X_WING             = 3.2
+HIDDEN_PAIR        = 3.4
+NAKED_TRIPLE       = 3.6
+SWORDFISH          = 3.8
+HIDDEN_TRIPLE      = 4.0
+GUESS              = 10.0
+
+# The line's cells outside the box and the box's cells outside the line,
+# for every line (unit index 0-17) and box that cross.
+_CROSS = {(u, b): (tuple(i for i in UNITS[u] if i not in BOXES[b]),
+                   tuple(i for i in BOXES[b] if i not in UNITS[u]))
+          for u in range(18) for b in range(9)
+          if set(UNITS[u]) & set(BOXES[b])}
+
+
+def rate(cells):
+    # cells: 81 digits, 0 for a blank. The puzzle is assumed valid.
+    vals  = bytearray(cells)
+    cands = [0 if n else ALL for n in vals]
+    for i, n in enumerate(vals):
+        if n:
+            for p in PEERS[i]:
+                cands[p] &= ~(1 << n)
+    hardest = 0.0
+    while 0 in vals:
+        for weight, step in _TECHNIQUES:
+            if step(vals, cands):
+                hardest = max(hardest, weight)
+                break
+        else:
+            return GUESS
+        if any(not cands[i] for i in range(81) if not vals[i]):
+            return GUESS
+    return hardest
+
+
+def _place(vals, cands, i, bit):
+    vals[i]  = bit.bit_length() - 1
+    cands[i] = 0
+    for p in PEERS[i]:
+        cands[p] &= ~bit
+
+
+def _hidden_singles(units):
+    def step(vals, cands):
+        found = []
+        for unit in units:
+            once = twice = 0
+            for i in unit:
+                twice |= once & cands[i]
+                once  |= cands[i]
+            once &= ~twice
+            while once:
+                bit   = once & -once
+                once ^= bit
+                found.extend((i, bit) for i in unit if cands[i] & bit)
+        # Every single found is forced, so they can all go in at once.
+        for i, bit in found:
+            if cands[i] & bit:
+                _place(vals, cands, i, bit)
+        return bool(found)
+    return step
+
+
+def _naked_singles(vals, cands):
+    found = [i for i in range(81) if POP[cands[i]] == 1]
+    for i in found:
+        if cands[i]:
+            _place(vals, cands, i, cands[i])
+    return bool(found)
+
+
+def _eliminate(cands, cells, mask):
+    hit = False
+    for i in cells:
+        if cands[i] & mask:
+            cands[i] &= ~mask
+            hit = True
+    return hit
+
+
+def _pointing(vals, cands):
+    # A digit confined to one row or column of a box is ruled out of the
+    # rest of that line.
+    hit = False
+    for b, box in enumerate(BOXES):
+        for d in range(1, 10):
+            bit   = 1 << d
+            cells = [i for i in box if cands[i] & bit]
+            if len(cells) < 2:
+                continue
+            rows = {RCB[i][0] for i in cells}
+            cols = {RCB[i][1] for i in cells}
+            if len(rows) == 1:
+                hit |= _eliminate(cands, _CROSS[rows.pop(), b][0], bit)
+            if len(cols) == 1:
+                hit |= _eliminate(cands, _CROSS[9 + cols.pop(), b][0], bit)
+    return hit
+
+
+def _claiming(vals, cands):
+    # A digit confined to one box within a row or column is ruled out of
+    # the rest of that box.
+    hit = False
+    for u in range(18):
+        for d in range(1, 10):
+            bit   = 1 << d
+            boxes = {RCB[i][2] for i in UNITS[u] if cands[i] & bit}
+            if len(boxes) == 1:
+                hit |= _eliminate(cands, _CROSS[u, boxes.pop()][1], bit)
+    return hit
+
+
+def _naked(size):
+    # size cells of a unit whose candidates together span size digits
+    # take those digits away from the rest of the unit.
+    def step(vals, cands):
+        hit = False
+        for unit in UNITS:
+            open_ = [i for i in unit if 2 <= POP[cands[i]] <= size]
+            for group in combinations(open_, size):
+                mask = 0
+                for i in group:
+                    mask |= cands[i]
+                if POP[mask] == size:
+                    hit |= _eliminate(cands, [i for i in unit
+                                              if i not in group], mask)
+        return hit
+    return step
+
+
+def _hidden(size):
+    # size digits that fit only the same size cells of a unit clear every
+    # other candidate from those cells.
+    def step(vals, cands):
+        hit = False
+        for unit in UNITS:
+            where = {}
+            for d in range(1, 10):
+                pos = [i for i in unit if cands[i] >> d & 1]
+                if 2 <= len(pos) <= size:
+                    where[d] = pos
+            for digits in combinations(where, size):
+                cells = set()
+                for d in digits:
+                    cells.update(where[d])
+                if len(cells) == size:
+                    keep = sum(1 << d for d in digits)
+                    for i in cells:
+                        if cands[i] & ~keep:
+                            cands[i] &= keep
+                            hit = True
+        return hit
+    return step
+
+
+def _fish(size):
+    # X-wing (2) and swordfish (3): when a digit's places in size rows
+    # all fall in the same size columns, the digit leaves the rest of
+    # those columns (and the same with rows and columns swapped).
+    def step(vals, cands):
+        hit = False
+        for base, cover in ((ROWS, COLS), (COLS, ROWS)):
+            for d in range(1, 10):
+                bit  = 1 << d
+                pos  = {}
+                for k, line in enumerate(base):
+                    spots = {j for j, i in enumerate(line) if cands[i] & bit}
+                    if 2 <= len(spots) <= size:
+                        pos[k] = spots
+                for lines in combinations(pos, size):
+                    spots = set().union(*(pos[k] for k in lines))
+                    if len(spots) != size:
+                        continue
+                    for j in spots:
+                        hit |= _eliminate(cands, [i for k, i in
+                                                  enumerate(cover[j])
+                                                  if k not in lines], bit)
+        return hit
+    return step
+
+
+_TECHNIQUES = (
+    (HIDDEN_SINGLE_BOX,  _hidden_singles(BOXES)),
+    (HIDDEN_SINGLE_LINE, _hidden_singles(UNITS[:18])),
+    (NAKED_SINGLE,       _naked_singles),
+    (POINTING,           _pointing),
+    (CLAIMING,           _claiming),
+    (NAKED_PAIR,         _naked(2)),
+    (X_WING,             _fish(2)),
+    (HIDDEN_PAIR,        _hidden(2)),
+    (NAKED_TRIPLE,       _naked(3)),
+    (SWORDFISH,          _fish(3)),
+    (HIDDEN_TRIPLE,      _hidden(3)),
+)
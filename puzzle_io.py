@@ -0,0 +1,245 @@
+import argparse
+import mmap
+import sys
+import time
+from itertools import islice
+
+import board
+import dlx
+import grader
+from database import add_pooled_puzzles, close_db, init_db
+from sudoku_engine import RATING_BANDS
+
+# Puzzle collections come in two formats, both read by streaming over a
+# memory map so a catalogue never has to fit in RAM:
+#
+#   text    one puzzle per line as 81 digits ('0' or '.' for a blank),
+#           optionally preceded by a difficulty and followed by the
+#           solution, separated by commas or spaces — the format
+#           bulk_generate.py writes. Blank lines and '#' comments are
+#           skipped. A puzzle given without a solution is solved on load.
+#   binary  MAGIC, then one board.pack record (PACKED_SIZE bytes: clue
+#           bitmap plus solution nibbles) per puzzle. Records carry no
+#           difficulty; it is worked out from the grader when needed.
+#
+# Records travel as (difficulty or None, packed bytes) pairs.
+
+MAGIC         = b"SUDOKU\x00\x01"
+BINARY_SUFFIX = ".bin"
+LOAD_BATCH    = 500      # puzzles per pool insert transaction
+
+
+def difficulty_of(data):
+    rating = grader.rate(board.masked(*board.unpack(data)))
+    for name, (lo, hi) in RATING_BANDS.items():
+        if lo < rating <= hi:
+            return name
+    return "Expert"
+
+
+def _mapped(path):
+    # Read-only map of the whole file, or None for an empty one (which
+    # mmap refuses).
+    with open(path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return None
+
+
+def is_binary(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# ── Reading ──────────────────────────────────────────────────────────
+
+def read(path, start=0, stop=None):
+    reader = _read_binary if is_binary(path) else _read_text
+    return islice(reader(path, start), 0,
+                  None if stop is None else max(stop - start, 0))
+
+
+def count(path):
+    if is_binary(path):
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            return (f.tell() - len(MAGIC)) // board.PACKED_SIZE
+    return sum(1 for _ in _lines(path))
+
+
+def _read_binary(path, start):
+    mm = _mapped(path)
+    try:
+        # Fixed-size records, so skipping ahead is a seek, not a scan.
+        end = len(mm) - (len(mm) - len(MAGIC)) % board.PACKED_SIZE
+        for off in range(len(MAGIC) + start * board.PACKED_SIZE, end,
+                         board.PACKED_SIZE):
+            yield None, mm[off:off + board.PACKED_SIZE]
+    finally:
+        mm.close()
+
+
+def _read_text(path, start):
+    for lineno, line in islice(_lines(path), start, None):
+        try:
+            yield parse_line(line)
+        except ValueError as e:
+            raise ValueError(f"{path}:{lineno}: {e}") from None
+
+
+def _lines(path):
+    # (line number, text) of each puzzle line, comments and blanks skipped.
+    # '-' reads stdin, which cannot be mapped.
+    if path == "-":
+        yield from _puzzle_lines(sys.stdin.buffer)
+        return
+    mm = _mapped(path)
+    if mm is None:
+        return
+    try:
+        yield from _puzzle_lines(iter(mm.readline, b""))
+    finally:
+        mm.close()
+
+
+def _puzzle_lines(lines):
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith(b"#"):
+            yield lineno, line
+
+
+def puzzles(path):
+    # Every puzzle in a collection as an 81-character string, not checked
+    # for a solution, for callers that judge that themselves. A text line
+    # that does not split into fields is passed on as it is.
+    if path != "-" and is_binary(path):
+        for _, data in _read_binary(path, 0):
+            yield board.to_string(board.masked(*board.unpack(data)))
+        return
+    for _, line in _lines(path):
+        try:
+            yield split_line(line)[1].decode("ascii")
+        except (ValueError, UnicodeDecodeError):
+            yield line.decode("ascii", "replace")
+
+
+def split_line(line):
+    # (difficulty or None, puzzle, solution or None) of a text line; the
+    # puzzle and solution fields are bytes and not yet checked.
+    if isinstance(line, str):
+        line = line.encode("ascii")
+    fields = line.replace(b",", b" ").split()
+    difficulty = None
+    if fields and len(fields[0]) != 81:
+        difficulty = fields.pop(0).decode("ascii").capitalize()
+        if difficulty not in RATING_BANDS:
+            raise ValueError(f"Unknown difficulty: {difficulty!r}")
+    if len(fields) not in (1, 2):
+        raise ValueError(f"Expected a puzzle and optional solution: {line!r}")
+    return difficulty, fields[0], fields[1] if len(fields) == 2 else None
+
+
+def parse_line(line):
+    difficulty, puzzle, solution = split_line(line)
+    puzzle = board.parse(puzzle.decode("ascii"))
+    clues  = board.clue_mask(puzzle)
+    if solution is not None:
+        solution = board.parse(solution.decode("ascii"))
+        if 0 in solution or board.masked(solution, clues) != puzzle:
+            raise ValueError("Solution does not complete the puzzle")
+    else:
+        found = list(islice(dlx.solutions(puzzle), 2))
+        if len(found) != 1:
+            raise ValueError("Puzzle has no solution" if not found
+                             else "Puzzle has more than one solution")
+        solution = found[0]
+    return difficulty, board.pack(solution, clues)
+
+
+# ── Writing ──────────────────────────────────────────────────────────
+
+def format_line(difficulty, data):
+    solution, clues = board.unpack(data)
+    line = (f"{board.to_string(board.masked(solution, clues))},"
+            f"{board.to_string(solution)}")
+    return f"{difficulty},{line}\n" if difficulty else line + "\n"
+
+
+def write(path, records):
+    # Binary when path ends in BINARY_SUFFIX, text otherwise ('-' for
+    # stdout). Records are written as they arrive; returns how many.
+    done = 0
+    if path.endswith(BINARY_SUFFIX):
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            for _, data in records:
+                f.write(data)
+                done += 1
+        return done
+    out = sys.stdout if path == "-" else open(path, "w")
+    try:
+        for difficulty, data in records:
+            out.write(format_line(difficulty, data))
+            done += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return done
+
+
+# ── Pool ─────────────────────────────────────────────────────────────
+
+def load_pool(path, difficulty=None):
+    # Streams a collection into the puzzle pool in batches. Puzzles
+    # without a difficulty (from the file or the argument) are graded.
+    batches, done = {}, 0
+    for d, data in read(path):
+        d = difficulty or d or difficulty_of(data)
+        batch = batches.setdefault(d, [])
+        batch.append(data)
+        if len(batch) >= LOAD_BATCH:
+            add_pooled_puzzles(d, batch)
+            batch.clear()
+        done += 1
+    for d, batch in batches.items():
+        if batch:
+            add_pooled_puzzles(d, batch)
+    return done
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(
+        description="Convert puzzle collections or load them into the pool.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    cv  = sub.add_parser("convert", help="rewrite a collection in the "
+                         f"format implied by DST ({BINARY_SUFFIX} = binary)")
+    cv.add_argument("src")
+    cv.add_argument("dst")
+    lp  = sub.add_parser("load-pool", help="add a collection to the pool")
+    lp.add_argument("src")
+    lp.add_argument("-d", "--difficulty", choices=list(RATING_BANDS),
+                    help="file every puzzle under this difficulty")
+    args = ap.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        if args.command == "convert":
+            done = write(args.dst, read(args.src))
+        else:
+            init_db()
+            try:
+                done = load_pool(args.src, args.difficulty)
+            finally:
+                close_db()
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    secs = time.perf_counter() - start
+    print(f"{done} puzzles in {secs:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import threading
+
+from database import (add_pooled_puzzles, close_db, pop_pooled_puzzle,
+                      pooled_puzzle_counts)
+from sudoku_engine import SudokuEngine
+
+DIFFICULTIES    = ("Easy", "Medium", "Hard", "Expert")
+POOL_HIGH_WATER = 20     # refill a difficulty up to this many puzzles
+POOL_LOW_WATER  = 5      # ...once it has dropped to this many
+
+
+class PuzzlePool:
+    def __init__(self, high_water=POOL_HIGH_WATER, low_water=POOL_LOW_WATER):
+        self.high_water = high_water
+        self.low_water  = min(low_water, high_water)
+        self.engine     = SudokuEngine()
+        self._refilling = set()
+        self._wake      = threading.Event()
+        self._stop      = threading.Event()
+        self._thread    = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def take(self, difficulty):
+        row = pop_pooled_puzzle(difficulty)
+        self._wake.set()
+        return row
+
+    def _run(self):
+        try:
+            self._refill()
+        finally:
+            close_db()
+
+    def _refill(self):
+        while not self._stop.is_set():
+            counts = pooled_puzzle_counts()
+            for d in DIFFICULTIES:
+                n = counts.get(d, 0)
+                if n <= self.low_water:
+                    self._refilling.add(d)
+                elif n >= self.high_water:
+                    self._refilling.discard(d)
+            if not self._refilling:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            # One puzzle at a time for the emptiest difficulty, so a drained
+            # level is topped up before a merely low one.
+            d = min(self._refilling, key=lambda d: counts.get(d, 0))
+            self.engine.generate(d)
+            add_pooled_puzzles(d, [self.engine.pack()])
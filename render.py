@@ -0,0 +1,43 @@
+# Keeps the game canvas in step with the board without repainting it.
+# Cells are marked dirty as the game changes; flush() asks for the style
+# of just those cells and sends Tk only the item attributes that differ
+# from what the canvas already shows.
+
+
+class CellRenderer:
+    def __init__(self, canvas, rects, texts):
+        self.canvas     = canvas
+        self.rects      = rects      # rectangle item per cell, row-major
+        self.texts      = texts      # text item per cell, row-major
+        self._shown     = {}         # item id -> attributes last sent to Tk
+        self._dirty     = set()
+        self.tk_calls   = 0          # itemconfig calls sent so far
+        self.frames     = 0          # flushes so far
+        self.last_calls = 0          # itemconfig calls in the latest flush
+
+    def mark(self, cells):
+        self._dirty.update(cells)
+
+    def mark_all(self):
+        self._dirty.update(range(81))
+
+    def flush(self, style):
+        # style(i) -> (rect attributes, text attributes) for cell i.
+        calls = 0
+        for i in self._dirty:
+            rect, text = style(i)
+            calls += self._push(self.rects[i], rect)
+            calls += self._push(self.texts[i], text)
+        self._dirty.clear()
+        self.frames    += 1
+        self.last_calls = calls
+        self.tk_calls  += calls
+
+    def _push(self, item, attrs):
+        shown = self._shown.setdefault(item, {})
+        diff  = {k: v for k, v in attrs.items() if shown.get(k) != v}
+        if not diff:
+            return 0
+        self.canvas.itemconfig(item, **diff)
+        shown.update(diff)
+        return 1
@@ -0,0 +1,126 @@
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from database import close_db, save_scores, score_record
+
+SCORE_BATCH_SIZE  = 50     # most scores written in one transaction
+SCORE_BATCH_DELAY = 0.2    # seconds to wait for more scores before writing
+SCORE_RETRY_DELAY = 1.0    # pause before retrying a busy or locked database
+
+_BUSY_CODES = (5, 6)       # SQLITE_BUSY, SQLITE_LOCKED
+
+
+def _is_busy(exc):
+    # sqlite_errorcode only exists from Python 3.11 (and may be an extended
+    # code, with the primary one in the low byte); before that the message
+    # is all there is to go on.
+    code = getattr(exc, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in _BUSY_CODES
+    return "locked" in str(exc) or "busy" in str(exc)
+
+
+class ScoreWriter:
+    def __init__(self, batch_size=SCORE_BATCH_SIZE, delay=SCORE_BATCH_DELAY):
+        self.batch_size = batch_size
+        self.delay      = delay
+        self._queue     = queue.Queue()
+        self._idle      = threading.Condition()
+        self._pending   = 0     # submitted, not yet written or dropped
+        self._lost      = 0     # dropped since the last flush
+        self._thread    = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        # Everything submitted before stop() is written before the
+        # thread exits.
+        self._queue.put(None)
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, user_id, difficulty, time_secs, hints_used, score):
+        with self._idle:
+            self._pending += 1
+        self._queue.put(score_record(user_id, difficulty, time_secs,
+                                     hints_used, score))
+
+    def flush(self, timeout=None):
+        # Blocks until every submitted score has been written or dropped.
+        # False on timeout, or if a score was dropped since the last flush.
+        with self._idle:
+            done = self._idle.wait_for(lambda: not self._pending, timeout)
+            lost, self._lost = self._lost, 0
+        return done and not lost
+
+    def pending(self):
+        with self._idle:
+            return self._pending
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                batch    = []
+                item     = self._queue.get()
+                deadline = time.monotonic() + self.delay
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._queue.get(
+                            timeout=max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                else:
+                    stopping = True
+                if batch:
+                    try:
+                        self._write(batch)
+                    except Exception as exc:
+                        # The batch is already settled; whatever went
+                        # wrong must not stop later scores being written.
+                        print(f"Score writer error: {exc}", file=sys.stderr)
+        finally:
+            close_db()
+
+    def _write(self, batch):
+        # Any other error means some record cannot be written as it is,
+        # so the batch is retried a record at a time and only the records
+        # that still fail are dropped. Either way every record in the batch
+        # stops being pending.
+        lost = 0
+        try:
+            self._save(batch)
+        except Exception:
+            for record in batch:
+                try:
+                    self._save([record])
+                except Exception as exc:
+                    lost += 1
+                    print(f"Score not saved: {exc}", file=sys.stderr)
+        finally:
+            with self._idle:
+                self._pending -= len(batch)
+                self._lost    += lost
+                self._idle.notify_all()
+
+    def _save(self, records):
+        # A busy or locked database only delays the write; it is never
+        # dropped for that.
+        while True:
+            try:
+                return save_scores(records)
+            except sqlite3.OperationalError as exc:
+                if not _is_busy(exc):
+                    raise
+                time.sleep(SCORE_RETRY_DELAY)
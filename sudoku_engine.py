@@ -1,99 +1,573 @@
 import random
+from itertools import islice
+
+import board
+import dlx
+import grader
+
+GEN_ATTEMPTS = 2
+SOLVERS = ("backtrack", "dlx", "mrv")
+
+# The grader rating (lo, hi] each difficulty aims for; see grader.py.
+# Puzzles that need guessing (grader.GUESS) are in no band. Digging for
+# 58 blanks seldom gets past pointing and claiming, so Expert's band is
+# rarely reached: in practice an Expert puzzle is the hardest one without
+# guessing that GEN_ATTEMPTS attempts turn up.
+RATING_BANDS = {
+    "Easy":   (0.0,                    grader.HIDDEN_SINGLE_BOX),
+    "Medium": (grader.HIDDEN_SINGLE_BOX, grader.NAKED_SINGLE),
+    "Hard":   (grader.NAKED_SINGLE,     grader.HIDDEN_PAIR),
+    "Expert": (grader.HIDDEN_PAIR,      grader.HIDDEN_TRIPLE),
+}
+
+
+# Geometry and candidate lookups used in the hot loops; see board.py.
+ALL   = board.ALL
+POP   = board.POP
+RCB   = board.RCB
+PEERS = board.PEERS
+
+
+def _hidden_single(cells, rows, cols, boxes):
+    # Returns (index, bit) of a digit that fits only one cell of some unit,
+    # None if a unit has a digit that fits nowhere, or () if neither.
+    r1, r2 = rows[:], [0]*9
+    c1, c2 = cols[:], [0]*9
+    b1, b2 = boxes[:], [0]*9
+    for i in cells:
+        r, c, b = RCB[i]
+        cand = ALL & ~(rows[r] | cols[c] | boxes[b])
+        r2[r] |= r1[r] & cand
+        r1[r] |= cand
+        c2[c] |= c1[c] & cand
+        c1[c] |= cand
+        b2[b] |= b1[b] & cand
+        b1[b] |= cand
+    for u in range(9):
+        if r1[u] != ALL or c1[u] != ALL or b1[u] != ALL:
+            return None
+    # Digits already placed in a unit count as "seen", so strip them out.
+    for u in range(9):
+        r1[u] &= ~(r2[u] | rows[u])
+        c1[u] &= ~(c2[u] | cols[u])
+        b1[u] &= ~(b2[u] | boxes[u])
+    for k, i in enumerate(cells):
+        r, c, b = RCB[i]
+        only = (r1[r] | c1[c] | b1[b]) & ~(rows[r] | cols[c] | boxes[b])
+        if only:
+            return k, only & -only
+    return ()
 
 
 class SudokuEngine:
-    def __init__(self):
-        self.grid     = [[0]*9 for _ in range(9)]
-        self.solution = [[0]*9 for _ in range(9)]
-        self.clues    = [[False]*9 for _ in range(9)]
-
-    def generate(self, difficulty):
-        random.seed()
-        self.grid  = [[0]*9 for _ in range(9)]
-        self.clues = [[False]*9 for _ in range(9)]
-        self._fill(0, 0)
-        self.solution = [row[:] for row in self.grid]
+    def __init__(self, solver="backtrack"):
+        if solver not in SOLVERS:
+            raise ValueError(f"Unknown solver: {solver!r}")
+        self.solver   = solver
+        self.grid     = board.empty()
+        self.solution = board.empty()
+        self.clues    = 0
+        self.nodes    = 0
+        self.rng      = random.Random()
+        self.cancelled = False
+        self.rating   = None
+        self._sync_masks()
+        self._sync_tallies()
+
+    # ── Cell access ──────────────────────────────────────────────────
+
+    def value(self, row, col):
+        return self.grid[row*9 + col]
+
+    def answer(self, row, col):
+        return self.solution[row*9 + col]
+
+    def is_clue(self, row, col):
+        return self.clues >> (row*9 + col) & 1 == 1
+
+    def set_value(self, row, col, n):
+        i   = row*9 + col
+        old = self.grid[i]
+        if old == n:
+            return
+        if old:
+            self._tally(i, old, -1)
+        if n:
+            self._tally(i, n, 1)
+        self.grid[i] = n
+
+    def reveal(self, row, col):
+        self.set_value(row, col, self.answer(row, col))
+        self.clues |= 1 << (row*9 + col)
+
+    def clear_entries(self):
+        self.grid = board.masked(self.grid, self.clues)
+        self._sync_tallies()
+
+    def is_conflict(self, row, col):
+        i = row*9 + col
+        n = self.grid[i]
+        if not n:
+            return False
+        r, c, b = RCB[i]
+        counts = self._counts
+        return (counts[r*10 + n] > 1 or counts[90 + c*10 + n] > 1
+                or counts[180 + b*10 + n] > 1)
+
+    # ── Conflict tallies ─────────────────────────────────────────────
+    # How many times each digit appears in each of the 27 units, the
+    # number of (unit, digit) pairs seen more than once, and the number of
+    # filled cells — kept current by set_value so win and conflict checks
+    # never rescan the grid.
+
+    def _sync_tallies(self):
+        self._counts   = [0] * 270
+        self.filled    = 0
+        self.conflicts = 0
+        for i, n in enumerate(self.grid):
+            if n:
+                self._tally(i, n, 1)
+
+    def _tally(self, i, n, step):
+        r, c, b = RCB[i]
+        counts = self._counts
+        for k in (r*10 + n, 90 + c*10 + n, 180 + b*10 + n):
+            before = counts[k]
+            counts[k] = before + step
+            if before == (1 if step > 0 else 2):
+                self.conflicts += step
+        self.filled += step
+
+    # ── Candidate bitmasks ───────────────────────────────────────────
+
+    def _sync_masks(self):
+        self.row_mask = [0]*9
+        self.col_mask = [0]*9
+        self.box_mask = [0]*9
+        for i, n in enumerate(self.grid):
+            if n:
+                r, c, b = RCB[i]
+                bit = 1 << n
+                self.row_mask[r] |= bit
+                self.col_mask[c] |= bit
+                self.box_mask[b] |= bit
+
+    def _place(self, i, n):
+        r, c, b = RCB[i]
+        bit = 1 << n
+        self.grid[i] = n
+        self.row_mask[r] |= bit
+        self.col_mask[c] |= bit
+        self.box_mask[b] |= bit
+
+    def _unplace(self, i):
+        r, c, b = RCB[i]
+        bit = ~(1 << self.grid[i])
+        self.grid[i] = 0
+        self.row_mask[r] &= bit
+        self.col_mask[c] &= bit
+        self.box_mask[b] &= bit
+
+    def _candidates(self, i):
+        r, c, b = RCB[i]
+        return ALL & ~(self.row_mask[r] | self.col_mask[c] | self.box_mask[b])
+
+    def _empties(self):
+        return [i for i, n in enumerate(self.grid) if not n]
+
+    # ── Generation ───────────────────────────────────────────────────
+
+    def generate(self, difficulty, seed=None):
+        self.rng = random.Random(seed)
         removes = {"Easy": 36, "Medium": 46, "Hard": 52, "Expert": 58}
-        self._remove(removes.get(difficulty, 46))
-        for r in range(9):
-            for c in range(9):
-                self.clues[r][c] = self.grid[r][c] != 0
+        target  = removes.get(difficulty, 46)
+        lo, hi  = RATING_BANDS.get(difficulty, RATING_BANDS["Medium"])
+        # Not every solution digs down to a unique puzzle in the band, so
+        # retry a few times and keep the best attempt: one that needs
+        # guessing only if they all do, then the fewest blanks short of the
+        # target, then the closest to the band.
+        best = None
+        for _ in range(GEN_ATTEMPTS):
+            self.grid = board.empty()
+            self._sync_masks()
+            self._fill(self._empties(), 0)
+            solution = self.grid[:]
+            done, rating = self._remove(target, lo, hi)
+            miss = (rating >= grader.GUESS, max(target - done, 0),
+                    -1.0 if lo < rating <= hi
+                    else max(lo - rating, rating - hi))
+            if best is None or miss < best[0]:
+                best = miss, rating, solution, self.grid[:]
+            if miss == (False, 0, -1.0):
+                break
+        _, self.rating, self.solution, puzzle = best
+        self.grid  = puzzle
+        self.clues = board.clue_mask(puzzle)
+        self._sync_masks()
+        self._sync_tallies()
+
+    def load(self, puzzle, solution):
+        self.grid     = board.parse(puzzle)
+        self.solution = board.parse(solution)
+        self.clues    = board.clue_mask(self.grid)
+        self.rating   = None
+        self._sync_masks()
+        self._sync_tallies()
+
+    def export(self):
+        return board.to_string(self.grid), board.to_string(self.solution)
 
-    def _fill(self, row, col):
-        if row == 9:
+    def load_packed(self, data):
+        self.solution, self.clues = board.unpack(data)
+        self.grid = board.masked(self.solution, self.clues)
+        self.rating = None
+        self._sync_masks()
+        self._sync_tallies()
+
+    def pack(self):
+        return board.pack(self.solution, self.clues)
+
+    def rate(self):
+        # Grader rating of the puzzle (clues only), worked out on demand
+        # for boards that were loaded rather than generated.
+        if self.rating is None:
+            self.rating = grader.rate(board.masked(self.solution, self.clues))
+        return self.rating
+
+    def _fill(self, empties, k):
+        if k == len(empties):
             return True
-        if col == 9:
-            return self._fill(row + 1, 0)
-        if self.grid[row][col] != 0:
-            return self._fill(row, col + 1)
-        nums = list(range(1, 10))
-        random.shuffle(nums)
+        i    = empties[k]
+        cand = self._candidates(i)
+        nums = [n for n in range(1, 10) if cand >> n & 1]
+        self.rng.shuffle(nums)
         for n in nums:
-            if self._safe(row, col, n):
-                self.grid[row][col] = n
-                if self._fill(row, col + 1):
-                    return True
-                self.grid[row][col] = 0
+            self._place(i, n)
+            if self._fill(empties, k + 1):
+                return True
+            self._unplace(i)
         return False
 
-    def solve(self, row=0, col=0):
-        if row == 9:
+    # ── Solving ──────────────────────────────────────────────────────
+
+    def solve(self, max_nodes=None):
+        # With max_nodes, a search that reaches that many nodes gives up as
+        # if cancelled, so the caller can tell it apart by self.nodes.
+        self.node_limit = max_nodes or float("inf")
+        try:
+            solved = self._run_solver()
+        finally:
+            self.cancelled = False
+        self._sync_tallies()
+        return solved
+
+    def cancel(self):
+        # Safe to call from another thread: the running (or next) solve
+        # stops at its next node, undoes its placements and returns False.
+        # nodes can likewise be read from another thread to show progress.
+        self.cancelled = True
+
+    def _dlx_tick(self, nodes):
+        self.nodes = nodes
+        return self.cancelled or nodes >= self.node_limit
+
+    def _run_solver(self):
+        self.nodes = 0
+        if self.solver == "dlx":
+            solved = dlx.solve(self.grid, tick=self._dlx_tick)
+            if solved is None:
+                return False
+            self.grid = solved
+            self._sync_masks()
             return True
-        if col == 9:
-            return self.solve(row + 1, 0)
-        if self.grid[row][col] != 0:
-            return self.solve(row, col + 1)
-        for n in range(1, 10):
-            if self._safe(row, col, n):
-                self.grid[row][col] = n
-                if self.solve(row, col + 1):
-                    return True
-                self.grid[row][col] = 0
-        return False
+        self._sync_masks()
+        empties = self._empties()
+        if self.solver == "mrv":
+            return self._solve_mrv(empties)
+        # For each empty cell, the later empty cells that share a unit with
+        # it — the only ones whose candidates a placement can wipe out.
+        order = {i: k for k, i in enumerate(empties)}
+        ahead = [[j for j in PEERS[i] if order.get(j, -1) > k]
+                 for k, i in enumerate(empties)]
+        return self._solve(empties, ahead)
 
-    def _safe(self, row, col, n):
-        if n in self.grid[row]:
-            return False
-        if any(self.grid[r][col] == n for r in range(9)):
+    def _solve(self, empties, ahead):
+        # Depth-first search over empties with an explicit stack: cands[k]
+        # holds the digits still to try in empties[k].
+        self.nodes += 1
+        if not empties:
+            return True
+        last  = len(empties) - 1
+        limit = self.node_limit
+        cands = [0] * len(empties)
+        cands[0] = self._candidates(empties[0])
+        k = 0
+        while True:
+            if cands[k] and not self.cancelled:
+                i    = empties[k]
+                bit  = cands[k] & -cands[k]
+                cands[k] ^= bit
+                self._place(i, bit.bit_length() - 1)
+                if all(self._candidates(j) for j in ahead[k]):
+                    self.nodes += 1
+                    if k == last:
+                        return True
+                    if self.nodes >= limit:
+                        self.cancelled = True
+                    k += 1
+                    cands[k] = self._candidates(empties[k])
+                else:
+                    self._unplace(i)
+            elif k:
+                k -= 1
+                self._unplace(empties[k])
+            else:
+                return False
+
+    def _solve_mrv(self, cells):
+        # Depth-first search with an explicit stack. Each node fills its
+        # singles, then branches on the cell with the fewest candidates;
+        # a frame holds that cell, the digits still to try in it, the cells
+        # left after it and the singles placed on the way in.
+        if self.cancelled:
             return False
-        br, bc = (row // 3) * 3, (col // 3) * 3
-        for r in range(br, br + 3):
-            for c in range(bc, bc + 3):
-                if self.grid[r][c] == n:
+        limit = self.node_limit
+        stack = []
+        while True:
+            self.nodes += 1
+            if self.nodes >= limit:
+                self.cancelled = True
+            placed = []
+            cells  = self._propagate(cells, placed)
+            if cells is not None:
+                if not cells:
+                    return True
+                best = min(cells, key=lambda i: POP[self._candidates(i)])
+                stack.append([best, self._candidates(best),
+                              [i for i in cells if i != best], placed])
+            else:
+                for i in placed:
+                    self._unplace(i)
+            while True:
+                if not stack:
                     return False
+                frame = stack[-1]
+                best, cand, rest, placed = frame
+                if self.grid[best]:
+                    self._unplace(best)
+                if cand and not self.cancelled:
+                    bit = cand & -cand
+                    frame[1] ^= bit
+                    self._place(best, bit.bit_length() - 1)
+                    cells = rest
+                    break
+                stack.pop()
+                for i in placed:
+                    self._unplace(i)
+
+    def _propagate(self, cells, placed):
+        # Fills naked and hidden singles until none are left. Returns the
+        # cells still empty, or None if some cell or digit has no place.
+        rows, cols, boxes = self.row_mask, self.col_mask, self.box_mask
+        while True:
+            rest = []
+            for i in cells:
+                r, c, b = RCB[i]
+                cand = ALL & ~(rows[r] | cols[c] | boxes[b])
+                if not cand:
+                    return None
+                if cand & (cand - 1):
+                    rest.append(i)
+                else:
+                    self._place(i, cand.bit_length() - 1)
+                    placed.append(i)
+            if len(rest) < len(cells):
+                cells = rest
+                continue
+            hit = _hidden_single(cells, rows, cols, boxes)
+            if hit is None:
+                return None
+            if not hit:
+                return cells
+            k, bit = hit
+            self._place(cells[k], bit.bit_length() - 1)
+            placed.append(cells[k])
+            cells = cells[:k] + cells[k+1:]
+
+    def _remove(self, count, lo, hi):
+        # Blanks cells while the solution stays unique: count of them, then
+        # doubling batches while the grader rates the puzzle at or below
+        # lo, grading once per batch. When a batch takes the rating past
+        # hi, the blanks are bisected for the first one that did it and that
+        # one is put back; a subset of unique blanks stays unique, so the
+        # rest can stay. Returns (blanks, rating), with fewer than count
+        # blanks when count is out of reach; those are bisected the same way
+        # so they never go past hi either.
+        positions = list(range(81))
+        self.rng.shuffle(positions)
+        deadly = board.deadly_rectangles(self.grid)
+        blanks = []
+        rated  = {0: 0.0}       # rating by number of leading blanks
+        good   = 0              # most leading blanks known to rate <= hi
+        graded = False          # rated[len(blanks)] is current
+        while True:
+            n = len(blanks)
+            if n + len(positions) < count:
+                positions.clear()
+            goal = count if n < count else 2*n - count + 1
+            while positions and len(blanks) < goal:
+                blank = self._blank_next(positions, deadly)
+                if blank:
+                    blanks.append(blank)
+            k = len(blanks)
+            if k < count and positions:
+                continue
+            if k == n and graded:
+                return k, rated[k]
+            rated[k] = grader.rate(self.grid)
+            graded   = True
+            if rated[k] <= lo:
+                good = k
+                continue
+            if rated[k] <= hi:
+                return k, rated[k]
+            a, b = good, k
+            while b - a > 1:
+                m    = (a + b) // 2
+                grid = self.grid[:]
+                for i, d in blanks[m:]:
+                    grid[i] = d
+                rated[m] = grader.rate(grid)
+                if rated[m] > hi:
+                    b = m
+                else:
+                    a = m
+            i, d = blanks.pop(a)
+            self._place(i, d)
+            good, graded = a, False
+
+    def _blank_next(self, positions, deadly):
+        # Tries the next cell, taking those from the fullest units first:
+        # spreading the blanks evenly lets the puzzle get sparser before it
+        # stops being unique. Returns the (cell, digit) blanked, or None if
+        # blanking it would admit a second solution. A cell that finishes
+        # blanking a deadly rectangle is turned down without a search.
+        i = max(positions, key=self._clue_weight)
+        positions.remove(i)
+        grid = self.grid
+        for a, b, c in deadly.get(i, ()):
+            if not (grid[a] or grid[b] or grid[c]):
+                return None
+        n = grid[i]
+        self._unplace(i)
+        if self._unique_without(i, n):
+            return i, n
+        self._place(i, n)
+        return None
+
+    def _clue_weight(self, i):
+        r, c, b = RCB[i]
+        return (POP[self.row_mask[r]] + POP[self.col_mask[c]]
+                + POP[self.box_mask[b]])
+
+    def _unique_without(self, i, n):
+        # The grid was unique with n in cell i, so it stays unique after
+        # blanking the cell iff no other candidate there leads to a solution.
+        empties = self._empties()
+        empties.remove(i)
+        alt = self._candidates(i) & ~(1 << n)
+        while alt:
+            bit  = alt & -alt
+            alt ^= bit
+            self._place(i, bit.bit_length() - 1)
+            found = self._count(empties, 1)
+            self._unplace(i)
+            if found:
+                return False
         return True
 
-    def _remove(self, count):
-        positions = [(r, c) for r in range(9) for c in range(9)]
-        random.shuffle(positions)
-        done = 0
-        for r, c in positions:
-            if done >= count:
-                break
-            if self.grid[r][c] != 0:
-                self.grid[r][c] = 0
-                done += 1
+    def count_solutions(self, limit=2, solution=None):
+        # When solution is an empty bytearray, the first solution found is
+        # copied into it, so one search both solves and checks uniqueness.
+        if self.solver == "dlx":
+            found = list(islice(dlx.solutions(self.grid), limit))
+            if found and solution is not None:
+                solution[:] = found[0]
+            return len(found)
+        if not self.is_valid():
+            return 0
+        self._sync_masks()
+        return self._count(self._empties(), limit, solution)
+
+    def all_solutions(self, limit=None):
+        return list(islice(dlx.solutions(self.grid), limit))
+
+    def _count(self, cells, limit, solution=None):
+        rows, cols, boxes = self.row_mask, self.col_mask, self.box_mask
+        grid  = self.grid
+        cells = cells[:]
+
+        def search(limit):
+            if not cells:
+                if solution is not None and not solution:
+                    solution[:] = grid
+                return 1
+            # Branch on the empty cell with the fewest candidates; a naked
+            # single ends the scan early.
+            best, best_n, best_cand = 0, 10, 0
+            for k, i in enumerate(cells):
+                r, c, b = RCB[i]
+                cand = ALL & ~(rows[r] | cols[c] | boxes[b])
+                n = POP[cand]
+                if n < best_n:
+                    best, best_n, best_cand = k, n, cand
+                    if n <= 1:
+                        break
+            if best_n == 0:
+                return 0
+            if best_n > 1:
+                hit = _hidden_single(cells, rows, cols, boxes)
+                if hit is None:
+                    return 0
+                if hit:
+                    best, best_cand = hit
+            cells[best], cells[-1] = cells[-1], cells[best]
+            i = cells.pop()
+            r, c, b = RCB[i]
+            found = 0
+            while best_cand and found < limit:
+                bit = best_cand & -best_cand
+                best_cand ^= bit
+                rows[r] |= bit
+                cols[c] |= bit
+                boxes[b] |= bit
+                grid[i] = bit.bit_length() - 1
+                found += search(limit - found)
+                rows[r] &= ~bit
+                cols[c] &= ~bit
+                boxes[b] &= ~bit
+            grid[i] = 0
+            cells.append(i)
+            cells[best], cells[-1] = cells[-1], cells[best]
+            return found
+
+        return search(limit)
+
+    # ── Validation ───────────────────────────────────────────────────
 
     def is_valid(self):
-        def unique(lst):
-            lst = [x for x in lst if x != 0]
-            return len(lst) == len(set(lst))
-        for i in range(9):
-            if not unique(self.grid[i]):
-                return False
-            if not unique([self.grid[r][i] for r in range(9)]):
+        rows, cols, boxes = [0]*9, [0]*9, [0]*9
+        for i, n in enumerate(self.grid):
+            if not n:
+                continue
+            r, c, b = RCB[i]
+            bit = 1 << n
+            if (rows[r] | cols[c] | boxes[b]) & bit:
                 return False
-        for br in range(3):
-            for bc in range(3):
-                box = [self.grid[r][c]
-                       for r in range(br*3, br*3+3)
-                       for c in range(bc*3, bc*3+3)]
-                if not unique(box):
-                    return False
+            rows[r]  |= bit
+            cols[c]  |= bit
+            boxes[b] |= bit
         return True
 
     def is_complete(self):
-        return (
-            all(self.grid[r][c] != 0 for r in range(9) for c in range(9))
-            and self.is_valid()
-        )
+        return self.filled == 81 and self.conflicts == 0
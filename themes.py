@@ -18,6 +18,9 @@ LIGHT = {
     "btn_warn":    "#E65100",
     "status_fg":   "#37474F",
     "select_bg":   "#FFFDE7",
+    "hover_bg":    "#F1F6FB",
+    "hint_bg":     "#E8F5E9",
+    "hint_fg":     "#2E7D32",
     "input_bg":    "#FFFFFF",
     "input_fg":    "#1A1A2E",
     "label_fg":    "#1A1A2E",
@@ -44,6 +47,9 @@ DARK = {
     "btn_warn":    "#FFAB40",
     "status_fg":   "#9E9E9E",
     "select_bg":   "#2E2B1F",
+    "hover_bg":    "#262630",
+    "hint_bg":     "#1B3A1F",
+    "hint_fg":     "#A5D6A7",
     "input_bg":    "#2A2A2A",
     "input_fg":    "#E0E0E0",
     "label_fg":    "#E0E0E0",
@@ -1,13 +1,27 @@
 
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, ttk
 import random
+import threading
 
 from themes import LIGHT, DARK
-from database import (init_db, login_user, register_user,
-                      save_score, get_leaderboard,
+from database import (init_db, close_db, login_user, register_user,
+                      leaderboard_page, user_rank,
                       get_profile, calculate_score)
+from board import PEERS
 from sudoku_engine import SudokuEngine
+from puzzle_pool import PuzzlePool
+from score_writer import ScoreWriter
+from render import CellRenderer
+from game_clock import GameClock
+
+LB_PAGE_SIZE  = 25
+FLUSH_TIMEOUT = 5.0      # seconds to wait for queued scores to be written
+POLL_MS       = 30       # how often the UI checks on a background task
+HIDDEN_TICK_MS = 5000    # timer display refresh while the window is minimized
+
+FONT_CLUE = ("Helvetica", 20, "bold")
+FONT_USER = ("Helvetica", 20)
 
 
 class SudokuApp:
@@ -21,17 +35,66 @@ class SudokuApp:
         self.user_id  = None
         self.username = None
         self.engine   = SudokuEngine()
+        self.solving  = None     # worker engine while a solve runs
+        self.screens  = {}       # name -> frame, kept between visits
+        self.binds    = {}       # name -> root bindings active on that screen
+        self.current  = None
 
         init_db()
+        self.pool = PuzzlePool()
+        self.pool.start()
+        self.scores = ScoreWriter()
+        self.scores.start()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self._show_login()
 
+    def _on_close(self):
+        self.scores.stop(FLUSH_TIMEOUT)
+        self.pool.stop()
+        self.root.destroy()
+
     # ═══════════════════════════════════════════════════════════════════
     # HELPERS
     # ═══════════════════════════════════════════════════════════════════
 
-    def _clear(self):
-        for w in self.root.winfo_children():
-            w.destroy()
+    def _screen(self, name):
+        # Shows the named screen and returns (frame, fresh). A screen's
+        # frame is built on its first visit and then only hidden and
+        # shown again; fresh tells the caller to fill it in.
+        frame = self.screens.get(name)
+        fresh = frame is None
+        if fresh:
+            frame = self.screens[name] = tk.Frame(self.root,
+                                                  bg=self.theme["bg"])
+        if self.current != name:
+            if self.current:
+                self.screens[self.current].pack_forget()
+                for seq, _ in self.binds.get(self.current, ()):
+                    self.root.unbind(seq)
+            frame.pack(fill="both", expand=True)
+            for seq, fn in self.binds.get(name, ()):
+                self.root.bind(seq, fn)
+            self.current = name
+        self.root.configure(bg=self.theme["bg"])
+        return frame, fresh
+
+    def _bind(self, name, seq, fn):
+        # A root binding that is only live while the named screen shows.
+        self.binds.setdefault(name, []).append((seq, fn))
+        if self.current == name:
+            self.root.bind(seq, fn)
+
+    def _drop_screens(self, *names):
+        for name in names or list(self.screens):
+            frame = self.screens.pop(name, None)
+            if frame is None:
+                continue
+            for seq, _ in self.binds.pop(name, ()):
+                if self.current == name:
+                    self.root.unbind(seq)
+            if self.current == name:
+                self.current = None
+            frame.destroy()
 
     def _btn(self, parent, text, cmd, style="primary", **kwargs):
         t   = self.theme
@@ -50,6 +113,61 @@ class SudokuApp:
                          activebackground=bg, activeforeground=fg,
                          bd=0, **kwargs)
 
+    def _in_background(self, fn, args, on_done, on_poll=None, on_error=None):
+        # Runs fn(*args) on a worker thread and hands its result to
+        # on_done on the Tk thread, which never blocks waiting for it.
+        # on_poll, if given, is called on every check while fn runs. If fn
+        # raises, the exception goes to on_error instead, or is re-raised
+        # on the Tk thread when there is none.
+        box = []
+
+        def work():
+            try:
+                box.append(fn(*args))
+            except Exception as exc:
+                box.append(exc)
+            finally:
+                close_db()
+
+        def poll():
+            if not box:
+                if on_poll:
+                    on_poll()
+                self.root.after(POLL_MS, poll)
+            elif isinstance(box[0], Exception):
+                if not on_error:
+                    raise box[0]
+                on_error(box[0])
+            else:
+                on_done(box[0])
+
+        threading.Thread(target=work, daemon=True).start()
+        poll()
+
+    def _after_flush(self, refresh, widget):
+        # Scores still queued from a game just won are waited for on a
+        # worker thread; the view is then refreshed if it is still there.
+        if not self.scores.pending():
+            return
+
+        def done(ok):
+            self._check_saved(ok)
+            if widget.winfo_exists():
+                refresh()
+
+        self._in_background(self.scores.flush, (FLUSH_TIMEOUT,), done)
+
+    def _check_saved(self, ok):
+        # ok is ScoreWriter.flush()'s result: False if a score was dropped,
+        # or is still waiting on a busy database after FLUSH_TIMEOUT.
+        if ok:
+            return
+        if self.scores.pending():
+            messagebox.showerror("Error", "The database is busy — your "
+                                 "score has not been saved yet.")
+        else:
+            messagebox.showerror("Error", "A score could not be saved.")
+
     def _label(self, parent, text, size=11, bold=False, color_key="label_fg"):
         font = ("Helvetica", size, "bold") if bold else ("Helvetica", size)
         return tk.Label(parent, text=text, font=font,
@@ -61,12 +179,14 @@ class SudokuApp:
     # ═══════════════════════════════════════════════════════════════════
 
     def _show_login(self):
-        self._clear()
-        self.root.unbind("<Return>")
+        frame, fresh = self._screen("login")
+        if not fresh:
+            self.l_err.config(text="")
+            self.l_user.focus()
+            return
         t = self.theme
-        self.root.configure(bg=t["bg"])
 
-        outer = tk.Frame(self.root, bg=t["bg"])
+        outer = tk.Frame(frame, bg=t["bg"])
         outer.pack(expand=True, fill="both", padx=60, pady=40)
 
         tk.Label(outer, text="SUDOKU", font=("Helvetica", 32, "bold"),
@@ -98,11 +218,12 @@ class SudokuApp:
                                bg=t["card_bg"], fg=t["error_fg"])
         self.l_err.pack()
 
-        self._btn(card, "Login", self._do_login).pack(fill="x", pady=(8, 4))
+        self.l_btn = self._btn(card, "Login", self._do_login)
+        self.l_btn.pack(fill="x", pady=(8, 4))
         self._btn(card, "Create Account", self._show_signup,
                   style="accent").pack(fill="x")
 
-        self.root.bind("<Return>", lambda e: self._do_login())
+        self._bind("login", "<Return>", lambda e: self._do_login())
         self.l_user.focus()
 
     def _do_login(self):
@@ -111,20 +232,43 @@ class SudokuApp:
         if not u or not p:
             self.l_err.config(text="Please fill in both fields.")
             return
-        ok, uid = login_user(u, p)
+        if self.l_btn["state"] == "disabled":
+            return
+        self.l_btn.config(state="disabled")
+        self.l_err.config(text="Checking…")
+        self._in_background(login_user, (u, p),
+                            lambda result: self._login_done(u, *result),
+                            on_error=self._login_failed)
+
+    def _login_done(self, username, ok, uid):
+        if not self.l_btn.winfo_exists():
+            return
         if ok:
             self.user_id  = uid
-            self.username = u
+            self.username = username
             self._show_game()
+            # Nothing returns to the login screen before logout rebuilds
+            # it, so the typed password goes with it now.
+            self._drop_screens("login")
         else:
+            self.l_btn.config(state="normal")
             self.l_err.config(text="Invalid username or password.")
 
+    def _login_failed(self, exc):
+        if not self.l_btn.winfo_exists():
+            return
+        self.l_btn.config(state="normal")
+        self.l_err.config(text=f"Could not log in: {exc}")
+
     def _show_signup(self):
-        self._clear()
+        frame, fresh = self._screen("signup")
+        if not fresh:
+            self.su_err.config(text="")
+            self.su_entries[0].focus()
+            return
         t = self.theme
-        self.root.configure(bg=t["bg"])
 
-        outer = tk.Frame(self.root, bg=t["bg"])
+        outer = tk.Frame(frame, bg=t["bg"])
         outer.pack(expand=True, fill="both", padx=60, pady=40)
 
         tk.Label(outer, text="SUDOKU", font=("Helvetica", 32, "bold"),
@@ -154,11 +298,12 @@ class SudokuApp:
                                 bg=t["card_bg"], fg=t["error_fg"])
         self.su_err.pack()
 
-        self._btn(card, "Sign Up", self._do_signup).pack(fill="x", pady=(8, 4))
+        self.su_btn = self._btn(card, "Sign Up", self._do_signup)
+        self.su_btn.pack(fill="x", pady=(8, 4))
         self._btn(card, "← Back to Login", self._show_login,
                   style="flat").pack(fill="x")
 
-        self.root.bind("<Return>", lambda e: self._do_signup())
+        self._bind("signup", "<Return>", lambda e: self._do_signup())
         self.su_entries[0].focus()
 
     def _do_signup(self):
@@ -175,26 +320,50 @@ class SudokuApp:
         if p != c:
             self.su_err.config(text="Passwords do not match.")
             return
-        ok, msg = register_user(u, p)
+        if self.su_btn["state"] == "disabled":
+            return
+        self.su_btn.config(state="disabled")
+        self.su_err.config(text="Creating account…")
+        self._in_background(register_user, (u, p),
+                            lambda result: self._signup_done(u, *result),
+                            on_error=self._signup_failed)
+
+    def _signup_done(self, username, ok, msg):
+        if not self.su_btn.winfo_exists():
+            return
         if ok:
-            messagebox.showinfo("Success", f"Welcome, {u}! Please login.")
+            messagebox.showinfo("Success",
+                                f"Welcome, {username}! Please login.")
+            self._drop_screens("signup")
             self._show_login()
         else:
+            self.su_btn.config(state="normal")
             self.su_err.config(text=msg)
 
+    def _signup_failed(self, exc):
+        if not self.su_btn.winfo_exists():
+            return
+        self.su_btn.config(state="normal")
+        self.su_err.config(text=f"Could not create account: {exc}")
+
     # ═══════════════════════════════════════════════════════════════════
     # GAME
     # ═══════════════════════════════════════════════════════════════════
 
     def _show_game(self):
-        self._clear()
-        self.root.unbind("<Return>")
+        frame, fresh = self._screen("game")
+        if not fresh:
+            self._resume_timer()
+            return
 
         self.difficulty      = tk.StringVar(value="Medium")
         self.hints_used      = 0
         self.selected        = None
-        self.elapsed         = 0
-        self.timer_running   = False
+        self.hover           = None
+        self.marks           = {}    # cell -> "hint" / "wrong" colouring
+        self._styles         = {}
+        self.clock           = GameClock()
+        self.shown_secs      = None
         self.timer_id        = None
         self.countdown_active = False
         self.countdown_id    = None
@@ -202,14 +371,14 @@ class SudokuApp:
         self.CELL = 56
         self.PAD  = 4
 
-        self._build_game_ui()
+        self._build_game_ui(frame)
         self.generate_puzzle()
 
-    def _build_game_ui(self):
+    def _build_game_ui(self, frame):
         t = self.theme
 
         # Header
-        self.hdr = tk.Frame(self.root, bg=t["header_bg"], pady=12)
+        self.hdr = tk.Frame(frame, bg=t["header_bg"], pady=12)
         self.hdr.pack(fill="x")
         tk.Label(self.hdr, text="SUDOKU",
                  font=("Helvetica", 24, "bold"),
@@ -225,29 +394,29 @@ class SudokuApp:
         self.timer_lbl.pack(side="left", padx=8)
 
         # Difficulty
-        self.diff_frm = tk.Frame(self.root, bg=t["bg"], pady=8)
+        self.diff_frm = tk.Frame(frame, bg=t["bg"], pady=8)
         self.diff_frm.pack(fill="x")
         self._build_diff_bar()
 
         # Canvas
-        self.cv_frm = tk.Frame(self.root, bg=t["bg"])
+        self.cv_frm = tk.Frame(frame, bg=t["bg"])
         self.cv_frm.pack(padx=15, pady=4)
         self._build_canvas()
 
         # Hints label
-        self.hints_lbl = tk.Label(self.root,
+        self.hints_lbl = tk.Label(frame,
                                    text="💡 Hints used: 0",
                                    font=("Helvetica", 10),
                                    bg=t["bg"], fg=t["status_fg"])
         self.hints_lbl.pack()
 
         # Action buttons
-        self.btn_frm = tk.Frame(self.root, bg=t["bg"], pady=8)
+        self.btn_frm = tk.Frame(frame, bg=t["bg"], pady=8)
         self.btn_frm.pack()
         self._build_action_buttons()
 
         # Nav buttons
-        nav = tk.Frame(self.root, bg=t["bg"], pady=4)
+        nav = tk.Frame(frame, bg=t["bg"], pady=4)
         nav.pack()
         for txt, cmd in [("🏆 Leaderboard", self._show_leaderboard),
                           ("👤 My Profile",  self._show_profile),
@@ -256,7 +425,7 @@ class SudokuApp:
 
         # Status bar
         self.status_var = tk.StringVar(value="Welcome back!")
-        self.status_lbl = tk.Label(self.root,
+        self.status_lbl = tk.Label(frame,
                                     textvariable=self.status_var,
                                     font=("Helvetica", 10),
                                     anchor="center", pady=5,
@@ -283,10 +452,13 @@ class SudokuApp:
         t = self.theme
         for w in self.btn_frm.winfo_children():
             w.destroy()
+        solve = (("■ Cancel",  self.cancel_solve,      "danger")
+                 if self.solving else
+                 ("⚡ Solve",    self.solve_puzzle,      "warn"))
         actions = [
             ("⟳ New Game",  self.generate_puzzle,   "primary"),
             ("✔ Check",     self.check_solution,    "accent"),
-            ("⚡ Solve",    self.solve_puzzle,      "warn"),
+            solve,
             ("💡 Hint",     self.give_hint,         "accent"),
             ("✕ Clear",    self.clear_grid,        "danger"),
             ("☀/☾ Theme",  self.toggle_theme,      "primary"),
@@ -307,21 +479,18 @@ class SudokuApp:
                                  bg=t["grid_bg"])
         self.canvas.pack()
 
-        self.rects = [[None]*9 for _ in range(9)]
-        self.texts = [[None]*9 for _ in range(9)]
-
+        rects, texts = [], []
         for row in range(9):
             for col in range(9):
                 x1, y1, x2, y2 = self._coords(row, col)
-                r = self.canvas.create_rectangle(
+                rects.append(self.canvas.create_rectangle(
                     x1, y1, x2, y2,
-                    fill="white", outline=t["cell_border"], width=1)
-                tx = self.canvas.create_text(
+                    fill="white", outline=t["cell_border"], width=1))
+                texts.append(self.canvas.create_text(
                     (x1+x2)//2, (y1+y2)//2,
-                    text="", font=("Helvetica", 20, "bold"),
-                    fill=t["clue_fg"])
-                self.rects[row][col] = r
-                self.texts[row][col] = tx
+                    text="", font=FONT_CLUE,
+                    fill=t["clue_fg"]))
+        self.renderer = CellRenderer(self.canvas, rects, texts)
 
         for i in range(4):
             x = PAD + i * (3*CELL + PAD)
@@ -346,7 +515,10 @@ class SudokuApp:
             fill="#FFFFFF", state="hidden", tags="cd")
 
         self.canvas.bind("<Button-1>", self._on_click)
-        self.root.bind("<Key>", self._on_key)
+        self.canvas.bind("<Motion>",   self._on_motion)
+        self.canvas.bind("<Leave>",    lambda e: self._set_hover(None))
+        self._bind("game", "<Key>", self._on_key)
+        self._bind("game", "<Map>", self._on_map)
 
     def _coords(self, row, col):
         C, P  = self.CELL, self.PAD
@@ -355,12 +527,30 @@ class SudokuApp:
         y1 = P + br*(3*C + P) + (row % 3)*C
         return x1, y1, x1+C, y1+C
 
+    def _cell_at(self, x, y):
+        # Inverse of _coords: (row, col) under a canvas point, or None
+        # over the gaps and borders.
+        row, col = self._axis_cell(y), self._axis_cell(x)
+        if row is None or col is None:
+            return None
+        return row, col
+
+    def _axis_cell(self, v):
+        C, P     = self.CELL, self.PAD
+        box, off = divmod(v - P, 3*C + P)
+        if 0 <= box < 3 and off < 3*C:
+            return box*3 + off // C
+        return None
+
     # ── Theme ────────────────────────────────────────────────────────
 
     def toggle_theme(self):
         self.is_dark = not self.is_dark
         self.theme   = DARK if self.is_dark else LIGHT
         t = self.theme
+        # Other screens are rebuilt in the new colours on their next visit.
+        self._drop_screens(*[n for n in self.screens if n != "game"])
+        self.screens["game"].configure(bg=t["bg"])
         self.root.configure(bg=t["bg"])
         self.hdr.configure(bg=t["header_bg"])
         for w in self.hdr.winfo_children():
@@ -375,6 +565,7 @@ class SudokuApp:
         self.canvas.itemconfig("box", fill=t["box_border"])
         self._build_diff_bar()
         self._build_action_buttons()
+        self._styles = {}
         self._redraw()
 
     # ── Canvas interaction ───────────────────────────────────────────
@@ -382,22 +573,32 @@ class SudokuApp:
     def _on_click(self, ev):
         if self.countdown_active:
             return
-        for r in range(9):
-            for c in range(9):
-                x1, y1, x2, y2 = self._coords(r, c)
-                if x1 <= ev.x <= x2 and y1 <= ev.y <= y2:
-                    self._select(r, c)
-                    return
+        cell = self._cell_at(ev.x, ev.y)
+        if cell:
+            self._select(*cell)
+
+    def _on_motion(self, ev):
+        self._set_hover(None if self.countdown_active
+                        else self._cell_at(ev.x, ev.y))
+
+    def _set_hover(self, cell):
+        if cell == self.hover:
+            return
+        for rc in (self.hover, cell):
+            if rc:
+                self.renderer.mark([rc[0]*9 + rc[1]])
+        self.hover = cell
+        self._render()
 
     def _select(self, row, col):
         if self.selected:
-            self._paint(*self.selected)
+            self.renderer.mark([self.selected[0]*9 + self.selected[1]])
         self.selected = (row, col)
-        self.canvas.itemconfig(self.rects[row][col],
-                                fill=self.theme["select_bg"])
+        self.renderer.mark([row*9 + col])
+        self._render()
 
     def _on_key(self, ev):
-        if self.countdown_active:
+        if self.countdown_active or self.solving:
             return
         if not self.selected:
             return
@@ -407,40 +608,71 @@ class SudokuApp:
             dr, dc = moves[ev.keysym]
             self._select((r+dr)%9, (c+dc)%9)
             return
-        if self.engine.clues[r][c]:
+        if self.engine.is_clue(r, c):
             return
+        old = self.engine.value(r, c)
         if ev.char.isdigit() and ev.char != "0":
-            self.engine.grid[r][c] = int(ev.char)
+            self.engine.set_value(r, c, int(ev.char))
         elif ev.keysym in ("BackSpace", "Delete") or ev.char == "0":
-            self.engine.grid[r][c] = 0
-        self._paint(r, c)
-        self.selected = (r, c)
-        self.canvas.itemconfig(self.rects[r][c],
-                                fill=self.theme["select_bg"])
+            self.engine.set_value(r, c, 0)
+        self.marks.pop(r*9 + c, None)
+        self.renderer.mark([r*9 + c])
+        self._mark_peers(r, c, old, self.engine.value(r, c))
+        self._render()
         if self.engine.is_complete():
             self._on_win()
 
-    def _paint(self, row, col, fill=None, fg=None):
-        t   = self.theme
-        val = self.engine.grid[row][col]
-        if self.engine.clues[row][col]:
-            f  = fill or t["clue_bg"]
-            fg = fg   or t["clue_fg"]
-            font = ("Helvetica", 20, "bold")
+    # ── Rendering ────────────────────────────────────────────────────
+
+    def _cell_style(self, i):
+        row, col = divmod(i, 9)
+        val = self.engine.value(row, col)
+        if i in self.marks:
+            state = self.marks[i]
+        elif self.engine.is_clue(row, col):
+            state = "clue"
+        elif self.engine.is_conflict(row, col):
+            state = "error"
         else:
-            f  = fill or t["user_bg"]
-            fg = fg   or (t["user_fg"] if val else t["user_bg"])
-            font = ("Helvetica", 20)
-        self.canvas.itemconfig(self.rects[row][col],
-                                fill=f, outline=t["cell_border"])
-        self.canvas.itemconfig(self.texts[row][col],
-                                text=str(val) if val else "",
-                                fill=fg, font=font)
+            state = "user"
+        focus = ("select" if self.selected == (row, col)
+                 else "hover" if self.hover == (row, col) else None)
+        key   = (state, val, focus)
+        style = self._styles.get(key)
+        if style is None:
+            style = self._styles[key] = self._make_style(*key)
+        return style
+
+    def _make_style(self, state, val, focus):
+        t = self.theme
+        bg, fg = {
+            "clue":  (t["clue_bg"],  t["clue_fg"]),
+            "error": (t["error_bg"], t["error_fg"]),
+            "wrong": (t["error_bg"], t["error_fg"]),
+            "hint":  (t["hint_bg"],  t["hint_fg"]),
+            "user":  (t["user_bg"],  t["user_fg"] if val else t["user_bg"]),
+        }[state]
+        rect = {"fill":    t[f"{focus}_bg"] if focus else bg,
+                "outline": t["cell_border"]}
+        text = {"text": str(val) if val else "",
+                "fill": fg,
+                "font": FONT_CLUE if state == "clue" else FONT_USER}
+        return rect, text
+
+    def _render(self):
+        self.renderer.flush(self._cell_style)
+
+    def _mark_peers(self, row, col, *digits):
+        # Only cells sharing a unit and holding one of the digits can have
+        # gained or lost a conflict.
+        grid = self.engine.grid
+        self.renderer.mark([i for i in PEERS[row*9 + col]
+                            if grid[i] and grid[i] in digits])
 
     def _redraw(self):
-        for r in range(9):
-            for c in range(9):
-                self._paint(r, c)
+        self.marks.clear()
+        self.renderer.mark_all()
+        self._render()
 
     # ── Countdown ────────────────────────────────────────────────────
 
@@ -457,39 +689,72 @@ class SudokuApp:
         else:
             self.canvas.itemconfig(self.cd_num, text="GO!")
             self.canvas.itemconfig(self.cd_sub, text="")
-            self.status_var.set("▶  Go! Timer started.")
+            self.status_var.set(
+                f"▶  Go! Timer started.  Puzzle rating: {self.engine.rate():.1f}")
             self.countdown_id = self.root.after(700, self._end_countdown)
 
     def _end_countdown(self):
         self.countdown_active = False
         self.canvas.itemconfig("cd", state="hidden")
         self._start_timer()
+        if self.current != "game":
+            self._pause_timer()
 
     # ── Timer ────────────────────────────────────────────────────────
 
+    # GameClock keeps the time; _tick only refreshes the label, so a late
+    # or skipped tick changes what is shown for a moment, never the score.
+
     def _start_timer(self):
         self._stop_timer()
-        self.elapsed = 0
-        self.timer_running = True
+        self.clock.start()
         self._tick()
 
     def _tick(self):
-        if not self.timer_running:
+        self.timer_id = None
+        secs = int(self.clock.elapsed())
+        if secs != self.shown_secs:
+            m, s = divmod(secs, 60)
+            self.timer_lbl.config(text=f"{m:02d}:{s:02d}")
+            self.shown_secs = secs
+        if not self.clock.is_running():
             return
-        m, s = divmod(self.elapsed, 60)
-        self.timer_lbl.config(text=f"{m:02d}:{s:02d}")
-        self.elapsed += 1
-        self.timer_id = self.root.after(1000, self._tick)
+        if self.root.state() in ("iconic", "withdrawn"):
+            delay = HIDDEN_TICK_MS
+        else:
+            # Wake just after the next whole second.
+            delay = int((1 - self.clock.elapsed() % 1) * 1000) + 5
+        self.timer_id = self.root.after(delay, self._tick)
 
-    def _stop_timer(self):
-        self.timer_running = False
+    def _cancel_tick(self):
         if self.timer_id:
             self.root.after_cancel(self.timer_id)
             self.timer_id = None
 
+    def _stop_timer(self):
+        self.clock.stop()
+        self._cancel_tick()
+
+    def _pause_timer(self):
+        self.clock.pause()
+        self._cancel_tick()
+
+    def _resume_timer(self):
+        self.clock.resume()
+        self._cancel_tick()
+        self._tick()
+
+    def _on_map(self, ev):
+        # Back from minimized: show the current time straight away rather
+        # than at the next slow tick.
+        if ev.widget is self.root and self.clock.is_running():
+            self._cancel_tick()
+            self._tick()
+
     # ── Puzzle actions ───────────────────────────────────────────────
 
     def generate_puzzle(self):
+        self.cancel_solve()
         self._stop_timer()
         if self.countdown_id:
             self.root.after_cancel(self.countdown_id)
@@ -498,73 +763,110 @@ class SudokuApp:
         self.selected   = None
         self.hints_used = 0
         self.hints_lbl.config(text="💡 Hints used: 0")
-        self.engine.generate(self.difficulty.get())
+        pooled = self.pool.take(self.difficulty.get())
+        if pooled:
+            self.engine.load_packed(pooled)
+        else:
+            self.engine.generate(self.difficulty.get())
         self._redraw()
         self._start_countdown(15)
 
     def check_solution(self):
+        if self.solving:
+            return
         if not self.engine.is_valid():
             self.status_var.set("❌  Errors found — wrong cells highlighted.")
-            t = self.theme
             for r in range(9):
                 for c in range(9):
-                    if (not self.engine.clues[r][c]
-                            and self.engine.grid[r][c] != 0
-                            and self.engine.grid[r][c] != self.engine.solution[r][c]):
-                        self._paint(r, c,
-                                    fill=t["error_bg"],
-                                    fg=t["error_fg"])
+                    if (not self.engine.is_clue(r, c)
+                            and self.engine.value(r, c) != 0
+                            and self.engine.value(r, c) != self.engine.answer(r, c)):
+                        self.marks[r*9 + c] = "wrong"
+                        self.renderer.mark([r*9 + c])
+            self._render()
         elif self.engine.is_complete():
             self._on_win()
         else:
             self.status_var.set("✅  No errors yet — keep going!")
 
     def solve_puzzle(self):
+        if self.solving:
+            return
+        self.engine.clear_entries()
+        self._redraw()
+        # The search runs on a copy so the board on screen never shows a
+        # half-finished attempt.
+        worker = SudokuEngine(self.engine.solver)
+        worker.load(*self.engine.export())
+        self.solving = worker
+        self._build_action_buttons()
+        self.status_var.set("⚡  Solving…")
+        self._in_background(
+            worker.solve, (),
+            lambda solved: self._solve_done(worker, solved),
+            on_poll=lambda: self._solve_progress(worker))
+
+    def _solve_progress(self, worker):
+        if self.solving is worker:
+            self.status_var.set(f"⚡  Solving… {worker.nodes:,} nodes")
+
+    def cancel_solve(self):
+        if not self.solving:
+            return
+        self.solving.cancel()
+        self.solving = None
+        self._build_action_buttons()
+        self.status_var.set("Solve cancelled.")
+
+    def _solve_done(self, worker, solved):
+        if self.solving is not worker:
+            return
+        self.solving = None
+        self._build_action_buttons()
+        if not solved:
+            messagebox.showerror("Error", "No solution found.")
+            return
         for r in range(9):
             for c in range(9):
-                if not self.engine.clues[r][c]:
-                    self.engine.grid[r][c] = 0
-        if self.engine.solve():
-            self._redraw()
-            self._stop_timer()
-            self.status_var.set("⚡  Auto-solved! No score recorded.")
-        else:
-            messagebox.showerror("Error", "No solution found.")
+                if not self.engine.is_clue(r, c):
+                    self.engine.set_value(r, c, worker.value(r, c))
+        self._redraw()
+        self._stop_timer()
+        self.status_var.set(
+            f"⚡  Auto-solved in {worker.nodes:,} nodes! No score recorded.")
 
     def give_hint(self):
-        if self.countdown_active:
+        if self.countdown_active or self.solving:
             return
         empties = [(r, c) for r in range(9) for c in range(9)
-                   if self.engine.grid[r][c] == 0]
+                   if self.engine.value(r, c) == 0]
         if not empties:
             self.status_var.set("No empty cells left!")
             return
         r, c = random.choice(empties)
-        self.engine.grid[r][c]  = self.engine.solution[r][c]
-        self.engine.clues[r][c] = True
+        self.engine.reveal(r, c)
         self.hints_used += 1
         self.hints_lbl.config(text=f"💡 Hints used: {self.hints_used}")
-        hf = "#E8F5E9" if not self.is_dark else "#1B3A1F"
-        hg = "#2E7D32" if not self.is_dark else "#A5D6A7"
-        self._paint(r, c, fill=hf, fg=hg)
+        self.marks[r*9 + c] = "hint"
+        self.renderer.mark([r*9 + c])
+        self._render()
         self.status_var.set(
-            f"💡  Hint: row {r+1}, col {c+1} = {self.engine.solution[r][c]}")
+            f"💡  Hint: row {r+1}, col {c+1} = {self.engine.answer(r, c)}")
 
     def clear_grid(self):
-        for r in range(9):
-            for c in range(9):
-                if not self.engine.clues[r][c]:
-                    self.engine.grid[r][c] = 0
+        if self.solving:
+            return
+        self.engine.clear_entries()
         self._redraw()
         self.status_var.set("Cleared — original clues kept.")
 
     def _on_win(self):
         self._stop_timer()
-        elapsed = max(self.elapsed - 1, 1)
+        elapsed = max(int(self.clock.elapsed()), 1)
         score   = calculate_score(self.difficulty.get(),
                                    elapsed, self.hints_used)
-        save_score(self.user_id, self.difficulty.get(),
-                   elapsed, self.hints_used, score)
+        self.scores.submit(self.user_id, self.difficulty.get(),
+                           elapsed, self.hints_used, score)
         m, s = divmod(elapsed, 60)
         self.status_var.set(
             f"🎉  Solved in {m:02d}:{s:02d}!  Score: {score}")
@@ -579,11 +881,16 @@ class SudokuApp:
     # ═══════════════════════════════════════════════════════════════════
 
     def _show_leaderboard(self):
-        self._clear()
+        self.cancel_solve()
+        self._pause_timer()
+        frame, fresh = self._screen("leaderboard")
+        if fresh:
+            self._build_leaderboard(frame)
+        self._lb_refresh()
+
+    def _build_leaderboard(self, frame):
         t = self.theme
-        self.root.configure(bg=t["bg"])
-
-        hdr = tk.Frame(self.root, bg=t["header_bg"], pady=12)
+        hdr = tk.Frame(frame, bg=t["header_bg"], pady=12)
         hdr.pack(fill="x")
         tk.Label(hdr, text="🏆  Leaderboard",
                  font=("Helvetica", 20, "bold"),
@@ -591,49 +898,141 @@ class SudokuApp:
         self._btn(hdr, "← Back", self._show_game,
                   style="primary").pack(side="right", padx=16)
 
-        frm = tk.Frame(self.root, bg=t["bg"], padx=20, pady=10)
-        frm.pack(fill="both", expand=True)
+        bar = tk.Frame(frame, bg=t["bg"], pady=8)
+        bar.pack(fill="x")
+        self.lb_scope = tk.StringVar(value="All")
+        for lvl in ("All", "Easy", "Medium", "Hard", "Expert"):
+            tk.Radiobutton(bar, text=lvl,
+                           variable=self.lb_scope, value=lvl,
+                           command=self._lb_refresh,
+                           font=("Helvetica", 11),
+                           bg=t["bg"], activebackground=t["bg"],
+                           fg=t["clue_fg"], selectcolor=t["clue_bg"],
+                           indicatoron=0, padx=10, pady=3,
+                           relief="flat", cursor="hand2").pack(side="left", padx=3)
+        self.lb_rank = tk.Label(bar, text="", font=("Helvetica", 10),
+                                bg=t["bg"], fg=t["status_fg"])
+        self.lb_rank.pack(side="right", padx=16)
 
-        headers = ["Rank", "Username", "Difficulty", "Time", "Score", "Date"]
-        widths  = [6, 14, 10, 8, 8, 12]
-        for i, (h, w) in enumerate(zip(headers, widths)):
-            tk.Label(frm, text=h, font=("Helvetica", 11, "bold"),
-                     bg=t["card_bg"], fg=t["label_fg"],
-                     width=w, anchor="center",
-                     relief="flat", pady=6).grid(row=0, column=i,
-                                                  padx=2, pady=2, sticky="ew")
-
-        rows = get_leaderboard()
-        if not rows:
-            tk.Label(frm, text="No scores yet. Play a game!",
-                     font=("Helvetica", 12),
-                     bg=t["bg"], fg=t["status_fg"]).grid(
-                         row=1, column=0, columnspan=6, pady=20)
-
-        for i, (uname, diff, tsecs, score, date) in enumerate(rows):
-            m, s    = divmod(tsecs, 60)
-            rank    = ["🥇", "🥈", "🥉"][i] if i < 3 else str(i+1)
-            vals    = [rank, uname, diff, f"{m:02d}:{s:02d}", str(score), date[:10]]
-            bg_row  = t["card_bg"] if i % 2 == 0 else t["bg"]
-            fg_row  = "#FFD700" if i == 0 else t["label_fg"]
-            for j, (v, w) in enumerate(zip(vals, widths)):
-                tk.Label(frm, text=v, font=("Helvetica", 11),
-                         bg=bg_row, fg=fg_row,
-                         width=w, anchor="center",
-                         pady=5).grid(row=i+1, column=j,
-                                       padx=2, pady=1, sticky="ew")
+        frm = tk.Frame(frame, bg=t["bg"], padx=20, pady=10)
+        frm.pack(fill="both", expand=True)
+        # The tree only draws the rows in view, and further pages are
+        # fetched whenever the view nears the bottom.
+        self.lb_tree = self._table(
+            frm, ["Rank", "Username", "Difficulty", "Time", "Score", "Date"],
+            [60, 140, 100, 80, 80, 120], height=15)
+        sb = ttk.Scrollbar(frm, orient="vertical", command=self.lb_tree.yview)
+
+        def on_scroll(first, last):
+            sb.set(first, last)
+            lb = self._lb
+            if float(last) > 0.9 and not lb["done"] and not lb["queued"]:
+                lb["queued"] = True
+                self.root.after_idle(self._lb_load_page)
+
+        self.lb_tree.configure(yscrollcommand=on_scroll)
+        self.lb_tree.pack(side="left", fill="both", expand=True)
+        sb.pack(side="right", fill="y")
+        self.lb_empty = tk.Label(frame, text="", font=("Helvetica", 12),
+                                 bg=t["bg"], fg=t["status_fg"])
+        self.lb_empty.pack(pady=(0, 10))
+
+    def _lb_refresh(self):
+        self._lb_fill()
+        self._after_flush(self._lb_fill, self.lb_tree)
+
+    def _lb_fill(self):
+        scope = self.lb_scope.get()
+        diff  = None if scope == "All" else scope
+        rank  = user_rank(self.user_id, diff)
+        self.lb_rank.config(text=f"Your best: #{rank[0]} with {rank[1]} points"
+                            if rank else "You have no scores here yet.")
+        self.lb_tree.delete(*self.lb_tree.get_children())
+        self._lb = {"scope": diff, "cursor": None, "count": 0,
+                    "done": False, "queued": False}
+        self._lb_load_page()
+
+    def _lb_load_page(self):
+        lb = self._lb
+        lb["queued"] = False
+        if lb["done"]:
+            return
+        rows, lb["cursor"] = leaderboard_page(
+            lb["cursor"], LB_PAGE_SIZE, difficulty=lb["scope"])
+        lb["done"] = lb["cursor"] is None
+        for uname, diff, tsecs, score, date in rows:
+            i     = lb["count"]
+            m, s  = divmod(tsecs, 60)
+            rank  = ["🥇", "🥈", "🥉"][i] if i < 3 else str(i+1)
+            vals  = [rank, uname, diff, f"{m:02d}:{s:02d}", str(score), date[:10]]
+            tags  = ["even" if i % 2 == 0 else "odd"]
+            if i == 0:
+                tags.append("first")
+            self.lb_tree.insert("", "end", values=vals, tags=tags)
+            lb["count"] += 1
+        self.lb_empty.config(
+            text="" if lb["count"] else "No scores yet. Play a game!")
+
+    def _table(self, parent, columns, widths, height):
+        t = self.theme
+        self._style_tables()
+        tree = ttk.Treeview(parent, columns=columns, show="headings",
+                            height=height, selectmode="none",
+                            style="Board.Treeview")
+        for col, w in zip(columns, widths):
+            tree.heading(col, text=col)
+            tree.column(col, width=w, anchor="center", stretch=False)
+        tree.tag_configure("even", background=t["card_bg"])
+        tree.tag_configure("odd",  background=t["bg"])
+        tree.tag_configure("first", foreground="#FFD700")
+        return tree
+
+    def _style_tables(self):
+        t     = self.theme
+        style = ttk.Style(self.root)
+        # "clam" is the built-in ttk theme that honours these colours on
+        # every platform.
+        style.theme_use("clam")
+        style.configure("Board.Treeview",
+                        background=t["bg"], fieldbackground=t["bg"],
+                        foreground=t["label_fg"], borderwidth=0,
+                        font=("Helvetica", 11), rowheight=28)
+        style.configure("Board.Treeview.Heading",
+                        background=t["card_bg"], foreground=t["label_fg"],
+                        font=("Helvetica", 11, "bold"), relief="flat")
 
     # ═══════════════════════════════════════════════════════════════════
     # PROFILE
     # ═══════════════════════════════════════════════════════════════════
 
     def _show_profile(self):
-        self._clear()
-        t    = self.theme
+        self.cancel_solve()
+        self._pause_timer()
+        frame, fresh = self._screen("profile")
+        if fresh:
+            self._build_profile(frame)
+        self._pf_fill()
+        self._after_flush(self._pf_fill, self.pf_tree)
+
+    def _pf_fill(self):
         data = get_profile(self.user_id, self.username)
-        self.root.configure(bg=t["bg"])
+        for key, var in self.pf_cards.items():
+            var.set(str(data[key]))
+        self.pf_tree.delete(*self.pf_tree.get_children())
+        for i, diff in enumerate(("Easy", "Medium", "Hard", "Expert")):
+            rd   = data["by_diff"][diff]
+            bt   = "—"
+            bs   = "—"
+            if rd and rd[0] is not None:
+                m, s = divmod(rd[0], 60)
+                bt   = f"{m:02d}:{s:02d}"
+                bs   = str(rd[1])
+            self.pf_tree.insert("", "end", values=[diff, bt, bs],
+                                tags=("even" if i % 2 == 0 else "odd",))
 
-        hdr = tk.Frame(self.root, bg=t["header_bg"], pady=12)
+    def _build_profile(self, frame):
+        t = self.theme
+        hdr = tk.Frame(frame, bg=t["header_bg"], pady=12)
         hdr.pack(fill="x")
         tk.Label(hdr, text=f"👤  {self.username}'s Profile",
                  font=("Helvetica", 20, "bold"),
@@ -641,21 +1040,23 @@ class SudokuApp:
         self._btn(hdr, "← Back", self._show_game,
                   style="primary").pack(side="right", padx=16)
 
-        outer = tk.Frame(self.root, bg=t["bg"], padx=24, pady=14)
+        outer = tk.Frame(frame, bg=t["bg"], padx=24, pady=14)
         outer.pack(fill="both", expand=True)
 
         # Summary cards
         cards_frm = tk.Frame(outer, bg=t["bg"])
         cards_frm.pack(fill="x", pady=(0, 14))
-        for i, (lbl, val) in enumerate([
-            ("Joined",       data["joined"]),
-            ("Games Played", str(data["total"])),
-            ("Best Score",   str(data["best_single"])),
-            ("Total Score",  str(data["total_score"])),
+        self.pf_cards = {}
+        for i, (lbl, key) in enumerate([
+            ("Joined",       "joined"),
+            ("Games Played", "total"),
+            ("Best Score",   "best_single"),
+            ("Total Score",  "total_score"),
         ]):
             card = tk.Frame(cards_frm, bg=t["card_bg"], padx=16, pady=12)
             card.grid(row=0, column=i, padx=6, sticky="ew")
-            tk.Label(card, text=val,
+            var  = self.pf_cards[key] = tk.StringVar()
+            tk.Label(card, textvariable=var,
                      font=("Helvetica", 18, "bold"),
                      bg=t["card_bg"], fg=t["label_fg"]).pack()
             tk.Label(card, text=lbl,
@@ -666,29 +1067,10 @@ class SudokuApp:
                  font=("Helvetica", 13, "bold"),
                  bg=t["bg"], fg=t["label_fg"]).pack(anchor="w", pady=(8, 4))
 
-        tbl = tk.Frame(outer, bg=t["bg"])
-        tbl.pack(fill="x")
-        for j, h in enumerate(["Difficulty", "Best Time", "Best Score"]):
-            tk.Label(tbl, text=h, font=("Helvetica", 11, "bold"),
-                     bg=t["card_bg"], fg=t["label_fg"],
-                     width=14, anchor="center",
-                     pady=6, relief="flat").grid(row=0, column=j,
-                                                  padx=2, pady=2)
-        for i, diff in enumerate(("Easy", "Medium", "Hard", "Expert")):
-            rd   = data["by_diff"][diff]
-            bt   = "—"
-            bs   = "—"
-            if rd and rd[0] is not None:
-                m, s = divmod(rd[0], 60)
-                bt   = f"{m:02d}:{s:02d}"
-                bs   = str(rd[1])
-            bg_r = t["card_bg"] if i % 2 == 0 else t["bg"]
-            for j, v in enumerate([diff, bt, bs]):
-                tk.Label(tbl, text=v, font=("Helvetica", 11),
-                         bg=bg_r, fg=t["label_fg"],
-                         width=14, anchor="center",
-                         pady=5).grid(row=i+1, column=j,
-                                       padx=2, pady=1)
+        self.pf_tree = self._table(
+            outer, ["Difficulty", "Best Time", "Best Score"],
+            [140, 140, 140], height=4)
+        self.pf_tree.pack(anchor="w")
 
     # ═══════════════════════════════════════════════════════════════════
     # LOGOUT
@@ -696,6 +1078,11 @@ class SudokuApp:
 
     def _logout(self):
         self._stop_timer()
+        if self.countdown_id:
+            self.root.after_cancel(self.countdown_id)
+        self.cancel_solve()
+        self._check_saved(self.scores.flush(FLUSH_TIMEOUT))
         self.user_id  = None
         self.username = None
+        self._drop_screens()
         self._show_login()
\ No newline at end of file